@@ -0,0 +1,66 @@
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pure-Python fallback
+    orjson = None
+
+# Filtered book lists longer than this are streamed in chunks
+STREAM_THRESHOLD = getattr(settings, "JSON_STREAM_THRESHOLD", 1000)
+STREAM_CHUNK_SIZE = getattr(settings, "JSON_STREAM_CHUNK_SIZE", 200)
+
+
+def dumps(data):
+    # Book rows hold only ids, titles and publication years, so orjson's
+    # output matches JSONRenderer once U+2028/U+2029 are escaped like it does
+    if orjson is not None:
+        out = orjson.dumps(data, default=encoders.JSONEncoder().default)
+    else:
+        out = json.dumps(data, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return out.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class FastJSONRenderer(JSONRenderer):
+    # orjson-backed JSONRenderer; iter_render feeds StreamingListMixin
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # Browsable/pretty output stays on the stock renderer
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+    def iter_render(self, books, chunk_size=STREAM_CHUNK_SIZE):
+        yield b"["
+        for start in range(0, len(books), chunk_size):
+            yield (b"," if start else b"") + dumps(books[start:start + chunk_size])[1:-1]
+        yield b"]"
+
+
+class StreamingListMixin:
+    # For BookListView, which returns every matching book in one list: past
+    # STREAM_THRESHOLD books the response is streamed instead of encoded whole
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        renderer = getattr(response, "accepted_renderer", None)
+        if (
+            not isinstance(renderer, FastJSONRenderer) or response.exception
+            or not isinstance(response.data, list) or len(response.data) <= STREAM_THRESHOLD
+            or renderer.get_indent(response.accepted_media_type, {})
+        ):
+            return response
+        streaming = StreamingHttpResponse(
+            renderer.iter_render(response.data), status=response.status_code,
+            content_type=response.accepted_media_type,
+        )
+        for header, value in response.items():
+            if header.lower() != "content-type":
+                streaming[header] = value
+        return streaming
@@ -73,5 +73,10 @@ REST_FRAMEWORK = {
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
-    ]
+    ],
+    # orjson responses; BookListView streams very long filtered lists
+    "DEFAULT_RENDERER_CLASSES": [
+        "advanced_api_project.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import Author, Book
 from datetime import datetime
 
@@ -7,6 +8,29 @@ class BookSerializer(serializers.ModelSerializer):
         model = Book
         fields = '__all__'
 
+    # ?fields=a,b limits a read to those fields; writes always use every field
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.requested_fields(self.context.get('request'))
+        if selected is not None:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+    @staticmethod
+    def requested_fields(request):
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        fields = request.query_params.get('fields')
+        return None if fields is None else set(filter(None, map(str.strip, fields.split(','))))
+
+    @classmethod
+    def prune_queryset(cls, queryset, request):
+        # title, publication_year and the author id all live on the book row
+        selected = cls.requested_fields(request)
+        if selected is None:
+            return queryset
+        return queryset.only('id', *(selected & {'title', 'publication_year', 'author'}))
+
     def validate_publication_year(self, value):
         if value > datetime.now().year:
             raise serializers.ValidationError("Publication year cannot be in the future.")
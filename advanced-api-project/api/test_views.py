@@ -1,3 +1,5 @@
+import json
+from unittest import mock
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -19,6 +21,19 @@ class BookAPITestCase(APITestCase):
         self.assertIsInstance(response.data, list)
         self.assertEqual(response.data[0]['title'], "Test Book")
 
+    def test_list_books_sparse_fields(self):
+        response = self.client.get(self.list_url, {'fields': 'id,title'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0], {'id': self.book.id, 'title': "Test Book"})
+
+    def test_long_lists_are_streamed(self):
+        Book.objects.create(title="Second Book", publication_year=2021, author=self.author)
+        with mock.patch('advanced_api_project.renderers.STREAM_THRESHOLD', 1):
+            response = self.client.get(self.list_url, {'ordering': 'title'})
+        self.assertTrue(response.streaming)
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([book['title'] for book in body], ["Second Book", "Test Book"])
+
     def test_retrieve_book(self):
         response = self.client.get(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
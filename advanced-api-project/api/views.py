@@ -1,6 +1,8 @@
-from rest_framework import generics
+from rest_framework import generics, permissions
+from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from django_filters import rest_framework as filters
+from advanced_api_project.renderers import StreamingListMixin
 from .models import Book
 from .serializers import BookSerializer
 
@@ -17,6 +19,10 @@ class BookDetailView(generics.RetrieveAPIView):
     serializer_class = BookSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_queryset(self):
+        # ?fields= defers the columns the response leaves out
+        return BookSerializer.prune_queryset(super().get_queryset(), self.request)
+
 # Create a new book
 class BookCreateView(generics.CreateAPIView):
     queryset = Book.objects.all()
@@ -36,13 +42,14 @@ class BookDeleteView(generics.DestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
 # List view with filtering, searching, and ordering
-class BookListView(generics.ListAPIView):
+class BookListView(StreamingListMixin, generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.DjangoFilterBackend, 
-                       generics.filters.SearchFilter, 
-                       generics.filters.OrderingFilter]
+    filter_backends = [filters.DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['title', 'author', 'publication_year']
     search_fields = ['title', 'author__name']
     ordering_fields = ['title', 'publication_year']
+
+    def get_queryset(self):
+        return BookSerializer.prune_queryset(super().get_queryset(), self.request)
@@ -1,7 +1,30 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import Book
 
 class BookSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = '__all__'
+
+    # ?fields=a,b limits a read to those fields; writes always use every field
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.selected_fields(self.context.get('request'))
+        if selected is not None:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+    @staticmethod
+    def selected_fields(request):
+        if request is None or request.method not in SAFE_METHODS or 'fields' not in request.query_params:
+            return None
+        return {part.strip() for part in request.query_params['fields'].split(',') if part.strip()}
+
+    @classmethod
+    def prune_queryset(cls, queryset, request):
+        # Every Book field is a plain column, so the rest can simply be deferred
+        selected = cls.selected_fields(request)
+        if selected is None:
+            return queryset
+        return queryset.only('pk', *(selected & {field.name for field in Book._meta.concrete_fields}))
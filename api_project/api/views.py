@@ -1,13 +1,21 @@
 from rest_framework import generics, viewsets
 from rest_framework.permissions import IsAuthenticated
+from api_project.renderers import StreamingListMixin
 from .models import Book
 from .serializers import BookSerializer
 
-class BookList(generics.ListAPIView):
+class BookList(StreamingListMixin, generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
 
-class BookViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        # ?fields= defers the columns the response leaves out
+        return BookSerializer.prune_queryset(super().get_queryset(), self.request)
+
+class BookViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return BookSerializer.prune_queryset(super().get_queryset(), self.request)
@@ -0,0 +1,67 @@
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pure-Python fallback
+    orjson = None
+
+# Book lists longer than this are streamed, STREAM_CHUNK_SIZE books at a time
+STREAM_THRESHOLD = getattr(settings, 'JSON_STREAM_THRESHOLD', 1000)
+STREAM_CHUNK_SIZE = getattr(settings, 'JSON_STREAM_CHUNK_SIZE', 200)
+
+
+def dumps(data):
+    # Compact UTF-8 JSON. Books are ids and strings, which orjson writes
+    # exactly like JSONRenderer (U+2028/U+2029 escaped the same way)
+    if orjson is not None:
+        out = orjson.dumps(data, default=encoders.JSONEncoder().default)
+    else:
+        out = json.dumps(data, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return out.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONRenderer(JSONRenderer):
+    # JSONRenderer backed by orjson, plus chunked encoding for StreamingListMixin
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # Pretty-printing is for humans; leave it to the stock renderer
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+    def iter_render(self, books, chunk_size=STREAM_CHUNK_SIZE):
+        yield b'['
+        for start in range(0, len(books), chunk_size):
+            yield (b',' if start else b'') + dumps(books[start:start + chunk_size])[1:-1]
+        yield b']'
+
+
+class StreamingListMixin:
+    # BookList and BookViewSet are unpaginated: a list response above
+    # STREAM_THRESHOLD books goes out as a StreamingHttpResponse instead of
+    # being encoded into one bytes object.
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        renderer = getattr(response, 'accepted_renderer', None)
+        if (
+            not isinstance(renderer, FastJSONRenderer) or response.exception
+            or not isinstance(response.data, list) or len(response.data) <= STREAM_THRESHOLD
+            or renderer.get_indent(response.accepted_media_type, {})
+        ):
+            return response
+        streaming = StreamingHttpResponse(
+            renderer.iter_render(response.data), status=response.status_code,
+            content_type=response.accepted_media_type,
+        )
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                streaming[header] = value
+        return streaming
@@ -72,6 +72,11 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # orjson responses; BookList/BookViewSet stream very long book lists
+    'DEFAULT_RENDERER_CLASSES': [
+        'api_project.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
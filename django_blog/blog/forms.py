@@ -3,14 +3,14 @@ from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
 from .models import Post, Comment
-from taggit.widgets import TagWidget  # Explicit import for TagWidget
+from taggit.forms import TagWidget  # Explicit import for TagWidget
 
 
 # ---------------------------
 # User Registration Form
 # ---------------------------
 
-class CustomUser CreationForm(UserCreationForm):
+class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(required=True, help_text="Enter a valid email address.")
 
     class Meta:
@@ -0,0 +1,110 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Post, Comment
+
+# Fragments are invalidated by version bumps; the timeout only bounds memory
+TIMEOUT = getattr(settings, 'BLOG_FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24)
+# What each version kind covers, per post, and the Post column holding it:
+#   post     - title, content, author, date (Post save, author rename)
+#   comments - the post's comments and their authors (Comment save/delete, author rename)
+#   tags     - the post's tag assignments
+FIELDS = {'post': 'version', 'comments': 'comments_version', 'tags': 'tags_version'}
+KINDS = tuple(FIELDS)
+
+
+class FragmentStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = {}
+            self.misses = {}
+
+    def record(self, name, hit):
+        with self._lock:
+            counts = self.hits if hit else self.misses
+            counts[name] = counts.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            names = sorted(set(self.hits) | set(self.misses))
+            return {
+                name: {
+                    'hits': self.hits.get(name, 0),
+                    'misses': self.misses.get(name, 0),
+                    'hit_rate': round(self.hits.get(name, 0) / (self.hits.get(name, 0) + self.misses.get(name, 0)), 3),
+                }
+                for name in names
+            }
+
+
+stats = FragmentStats()
+
+
+def get_versions(post, kinds):
+    return [getattr(post, FIELDS[kind]) for kind in kinds]
+
+
+def bump(kind, post_ids):
+    # A single UPDATE in the database, so concurrent bumps from any process all count
+    field = FIELDS[kind]
+    Post.objects.filter(pk__in=post_ids).update(**{field: F(field) + 1})
+
+
+def fragment_key(name, post, kinds, vary_on=()):
+    versions = '.'.join(str(v) for v in get_versions(post, kinds))
+    vary = ':'.join(str(value) for value in vary_on)
+    return f'blog:fragment:{name}:{post.pk}:{versions}:{vary}'
+
+
+def get_or_render(name, post, kinds, render, vary_on=()):
+    key = fragment_key(name, post, kinds, vary_on)
+    content = cache.get(key)
+    stats.record(name, hit=content is not None)
+    if content is None:
+        content = render()
+        cache.set(key, content, TIMEOUT)
+    return content
+
+
+# 👇 Version bumps: only fragments that read the changed data get new keys
+@receiver(post_save, sender=Post)
+def bump_post(sender, instance, created, **kwargs):
+    # New rows start from a fresh version; deleted ones are never rendered again
+    if not created:
+        bump('post', [instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comments(sender, instance, **kwargs):
+    bump('comments', [instance.post_id])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def bump_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Post):
+        bump('tags', [instance.pk])
+    else:
+        bump('tags', pk_set or ())
+
+
+@receiver(post_save, sender=User)
+def bump_author(sender, instance, created, update_fields, **kwargs):
+    # Post rows and comment threads print the username; saves that can't
+    # change it (e.g. last_login on every login) leave the fragments alone
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    bump('post', Post.objects.filter(author=instance).values('pk'))
+    bump('comments', Comment.objects.filter(author=instance).values('post_id'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Fill Post.body_html / Post.excerpt for existing posts in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help='Re-render posts that already have a body')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = Post.objects.all() if options['all'] else Post.objects.filter(body_html='').exclude(content='')
+        last_pk = 0
+        rendered = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk).order_by('pk').only('pk', 'content')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for post in batch:
+                post.render_content()
+            # bulk_update skips save(), so search and fragment signals stay quiet
+            with transaction.atomic():
+                Post.objects.bulk_update(batch, ['body_html', 'excerpt'])
+            rendered += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} posts.'))
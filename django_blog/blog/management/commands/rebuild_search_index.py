@@ -0,0 +1,48 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post, SearchDocument, SearchPosting
+from blog.search import STATS_CACHE_KEY, build_rows
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the blog search index in place, a batch of posts at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        indexed = 0
+        while True:
+            # Each batch's postings are replaced in one transaction, so searches
+            # keep seeing a full index while the rebuild runs. The batch's posts
+            # are locked so saves wait for it, and the upserts absorb rows a
+            # concurrent index_post (e.g. from a tag change) wrote in between.
+            with transaction.atomic():
+                posts = list(
+                    Post.objects.select_for_update().filter(pk__gt=last_pk).order_by('pk')
+                    .only('pk', 'title', 'content').prefetch_related('tags')[:batch_size]
+                )
+                if not posts:
+                    break
+                last_pk = posts[-1].pk
+                documents, postings = [], []
+                for post in posts:
+                    document, rows = build_rows(post, [tag.name for tag in post.tags.all()])
+                    documents.append(document)
+                    postings.extend(rows)
+                SearchPosting.objects.filter(post_id__in=[post.pk for post in posts]).delete()
+                SearchDocument.objects.bulk_create(
+                    documents, update_conflicts=True, unique_fields=['post'], update_fields=['length'],
+                )
+                SearchPosting.objects.bulk_create(
+                    postings, batch_size=1000, update_conflicts=True,
+                    unique_fields=['term', 'post'], update_fields=['frequency', 'doc_length'],
+                )
+            indexed += len(posts)
+
+        cache.delete(STATS_CACHE_KEY)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} posts.'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:33
+
+import blog.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_post_rendered_body'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_version',
+            field=models.BigIntegerField(default=blog.models.fresh_version, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='tags_version',
+            field=models.BigIntegerField(default=blog.models.fresh_version, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.BigIntegerField(default=blog.models.fresh_version, editable=False),
+        ),
+    ]
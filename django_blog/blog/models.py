@@ -1,5 +1,65 @@
+import time
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+from taggit.managers import TaggableManager
+
+EXCERPT_WORDS = 30
+
+
+def fresh_version():
+    # Time-based start, so a reused post id never matches an old fragment key
+    return time.time_ns()
+
+
+class Post(models.Model):
+    title = models.CharField(max_length=200)
+    content = models.TextField()
+    published_date = models.DateTimeField(auto_now_add=True)
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
+    tags = TaggableManager(blank=True)
+    # Rendered from content on save, so pages never run linebreaks/truncatewords
+    body_html = models.TextField(blank=True, editable=False)
+    excerpt = models.TextField(blank=True, editable=False)
+    # Fragment cache versions (blog.fragments), kept on the row so every process
+    # sees the same value and a page that loads the post gets them for free
+    version = models.BigIntegerField(default=fresh_version, editable=False)
+    comments_version = models.BigIntegerField(default=fresh_version, editable=False)
+    tags_version = models.BigIntegerField(default=fresh_version, editable=False)
+    # Only ever moved by fragments.bump(); a full save must not write back a stale value
+    VERSION_FIELDS = ('version', 'comments_version', 'tags_version')
+
+    class Meta:
+        # Serves the keyset-paginated listings (newest first)
+        indexes = [models.Index(fields=['-published_date', '-id'], name='blog_post_recent_idx')]
+
+    def __str__(self):
+        return self.title
+
+    def render_content(self):
+        # Same output as the `linebreaks` and `truncatewords:30` filters
+        self.body_html = linebreaks(self.content, autoescape=True)
+        self.excerpt = Truncator(self.content).words(EXCERPT_WORDS, truncate=' …')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            skip = {*self.VERSION_FIELDS, *self.get_deferred_fields()}
+            update_fields = [
+                f.attname for f in self._meta.concrete_fields
+                if not f.primary_key and f.attname not in skip
+            ]
+            kwargs['update_fields'] = update_fields
+        # Partial saves that leave content alone don't need a re-render
+        if update_fields is None or 'content' in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'body_html', 'excerpt'}
+        super().save(*args, **kwargs)
+
+
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
@@ -7,16 +67,31 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # A post's comments in thread order, for PostDetailView's pages
+        indexes = [models.Index(fields=['post', 'created_at', 'id'], name='blog_comment_thread_idx')]
+
     def __str__(self):
         return f'Comment by {self.author} on {self.post}'
 
 
-class Post(models.Model):
-    title = models.CharField(max_length=200)
-    content = models.TextField()
-    published_date = models.DateTimeField(auto_now_add=True)
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
+# Inverted index for blog.search: one row per (term, post) with the weighted
+# term frequency, plus each post's total length for BM25 normalisation.
+class SearchDocument(models.Model):
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    length = models.PositiveIntegerField(default=0)
+
+
+class SearchPosting(models.Model):
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='search_postings')
+    frequency = models.PositiveIntegerField()
+    # Copied from SearchDocument.length so ranking needs no join
+    doc_length = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('term', 'post')
 
-    def __str__(self):
-        return self.title
 
+# Connects the search indexing and fragment cache receivers
+from . import fragments, search  # noqa: E402,F401
@@ -0,0 +1,75 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from django.http import Http404
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, next_cursor, is_first):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+        self._has_next = has_next
+        self.next_url = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_next or not self.is_first
+
+
+class KeysetPaginator:
+    # Seek pagination over (field, pk), newest first. Each page is one
+    # indexed range scan with LIMIT per_page + 1; there is no COUNT(*),
+    # so the total page count is unknown and clients just "load more".
+    def __init__(self, queryset, per_page, field='published_date'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def page(self, cursor=None):
+        queryset = self.queryset.order_by(f'-{self.field}', '-pk')
+        if cursor:
+            value, pk = self.decode(cursor)
+            queryset = queryset.filter(Q(**{f'{self.field}__lt': value}) | Q(**{self.field: value, 'pk__lt': pk}))
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = self.encode(rows[-1]) if has_next else None
+        return KeysetPage(rows, has_next, next_cursor, is_first=not cursor)
+
+    def encode(self, obj):
+        raw = f'{getattr(obj, self.field).isoformat()}|{obj.pk}'
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def decode(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii')
+            value, pk = raw.rsplit('|', 1)
+            return datetime.fromisoformat(value), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise Http404('Invalid cursor')
+
+
+class KeysetPaginationMixin:
+    # Drop-in for ListView's offset pagination: ?after=<cursor> selects the
+    # page and page_obj.next_url is the "load more" link.
+    cursor_kwarg = 'after'
+    cursor_field = 'published_date'
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, self.cursor_field)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        if page.has_next():
+            params = self.request.GET.copy()
+            params[self.cursor_kwarg] = page.next_cursor
+            page.next_url = f'?{params.urlencode()}'
+        return paginator, page, page.object_list, page.has_other_pages()
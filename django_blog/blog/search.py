@@ -0,0 +1,142 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Case, Count, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+
+from .models import Post, SearchDocument, SearchPosting
+
+# Term weights per field: a title hit counts like several body hits
+TITLE_WEIGHT = getattr(settings, 'SEARCH_TITLE_WEIGHT', 3)
+TAG_WEIGHT = getattr(settings, 'SEARCH_TAG_WEIGHT', 2)
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# How many indexed terms one query prefix may expand to, and how much a
+# prefix-only match counts against an exact one
+MAX_EXPANSIONS = getattr(settings, 'SEARCH_MAX_PREFIX_EXPANSIONS', 20)
+PREFIX_WEIGHT = 0.5
+STATS_CACHE_KEY = 'blog:search:stats'
+STATS_TTL = 300
+MAX_TERM_LENGTH = 64
+TOKEN_RE = re.compile(r'\w+')
+STOPWORDS = frozenset('a an and are as at be by for from in is it of on or that the to was with'.split())
+
+
+def tokenize(text):
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return [
+        token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text)
+        if token not in STOPWORDS
+    ]
+
+
+def document_terms(post, tag_names=None):
+    terms = Counter()
+    for token in tokenize(post.title):
+        terms[token] += TITLE_WEIGHT
+    terms.update(tokenize(post.content))
+    if tag_names is None:
+        tag_names = post.tags.names()
+    for name in tag_names:
+        for token in tokenize(name):
+            terms[token] += TAG_WEIGHT
+    return terms
+
+
+def build_rows(post, tag_names=None):
+    terms = document_terms(post, tag_names)
+    length = sum(terms.values())
+    postings = [
+        SearchPosting(term=term, post_id=post.pk, frequency=frequency, doc_length=length)
+        for term, frequency in terms.items()
+    ]
+    return SearchDocument(post_id=post.pk, length=length), postings
+
+
+def index_post(post, tag_names=None):
+    # Replace a post's postings; cheap enough to redo on every change
+    document, postings = build_rows(post, tag_names)
+    with transaction.atomic():
+        SearchPosting.objects.filter(post_id=post.pk).delete()
+        SearchPosting.objects.bulk_create(postings)
+        SearchDocument.objects.update_or_create(post_id=post.pk, defaults={'length': document.length})
+
+
+def corpus_stats():
+    # (document count, average length); cached since BM25 only needs them roughly right
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        totals = SearchDocument.objects.aggregate(n=Count('pk'), avg=Avg('length'))
+        stats = (totals['n'], totals['avg'] or 1.0)
+        cache.set(STATS_CACHE_KEY, stats, STATS_TTL)
+    return stats
+
+
+def expand(tokens):
+    # Each query token matches every indexed term it prefixes, via a range
+    # scan on the (term, post) index; returns {term: (document frequency, weight)}
+    prefixes = Q()
+    for token in tokens:
+        prefixes |= Q(term__gte=token, term__lt=token + '\uffff')
+    rows = (
+        SearchPosting.objects.filter(prefixes).values('term')
+        .annotate(df=Count('pk')).values_list('term', 'df')
+    )
+    found = dict(rows)
+    terms = {}
+    for token in tokens:
+        matches = sorted((t for t in found if t.startswith(token)), key=lambda t: (t != token, -found[t]))
+        for term in matches[:MAX_EXPANSIONS]:
+            weight = 1.0 if term == token else PREFIX_WEIGHT
+            terms[term] = (found[term], max(weight, terms.get(term, (0, 0.0))[1]))
+    return terms
+
+
+def search(query, offset=0, limit=10):
+    # Returns ([(post_id, score)], has_more) ranked by BM25
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return [], False
+    terms = expand(tokens)
+    if not terms:
+        return [], False
+    total, avg_length = corpus_stats()
+    total = max(total, max(df for df, _ in terms.values()))
+    idf = Case(
+        *[
+            When(term=term, then=Value(weight * math.log(1 + (total - df + 0.5) / (df + 0.5))))
+            for term, (df, weight) in terms.items()
+        ],
+        output_field=FloatField(),
+    )
+    tf = Cast('frequency', FloatField())
+    norm = K1 * (1 - B + B * Cast('doc_length', FloatField()) / avg_length)
+    ranked = (
+        SearchPosting.objects.filter(term__in=terms).values('post_id')
+        .annotate(score=Sum(idf * tf * (K1 + 1) / (tf + norm)))
+        .order_by('-score', '-post_id')
+        .values_list('post_id', 'score')
+    )
+    rows = list(ranked[offset:offset + limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+# 👇 Keep the index in step with posts and their tags (deletes cascade)
+@receiver(post_save, sender=Post)
+def index_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_post(instance)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def index_on_tag_change(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        index_post(instance)
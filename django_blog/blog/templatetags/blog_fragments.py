@@ -0,0 +1,46 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from blog import fragments
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, post, kinds, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.post = post
+        self.kinds = kinds
+        self.vary_on = vary_on
+
+    def render(self, context):
+        kinds = [kind.strip() for kind in self.kinds.resolve(context).split(',')]
+        unknown = set(kinds) - set(fragments.KINDS)
+        if unknown:
+            raise template.TemplateSyntaxError(f'Unknown fragment version kind(s): {", ".join(sorted(unknown))}')
+        return mark_safe(fragments.get_or_render(
+            self.name.resolve(context), self.post.resolve(context), kinds,
+            lambda: self.nodelist.render(context),
+            [value.resolve(context) for value in self.vary_on],
+        ))
+
+
+@register.tag
+def cachefragment(parser, token):
+    """
+    Caches a block until the listed versions of a post change:
+
+        {% cachefragment "comments" post "comments" user.pk %}...{% endcachefragment %}
+
+    Arguments are the fragment name, the post (whose row carries the
+    versions), a comma-separated list of version kinds (post, comments, tags)
+    and any extra values to vary on.
+    """
+    bits = token.split_contents()
+    if len(bits) < 4:
+        raise template.TemplateSyntaxError(f'{bits[0]} takes a name, a post and version kinds')
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    name, post, kinds, *vary_on = (parser.compile_filter(bit) for bit in bits[1:])
+    return FragmentNode(nodelist, name, post, kinds, vary_on)
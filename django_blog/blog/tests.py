@@ -1 +1,257 @@
-# tests.py
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template.defaultfilters import linebreaks_filter, truncatewords
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import fragments, search
+from .models import Post, Comment, SearchDocument, SearchPosting
+
+
+class PostDetailQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="password")
+        self.reader = User.objects.create_user(username="reader", password="password")
+        self.post = Post.objects.create(title="Post", content="Body", author=self.author)
+        self.post.tags.add("django", "python")
+        self.url = reverse('blog:post_detail', args=[self.post.pk])
+
+    def add_comments(self, count):
+        for i in range(count):
+            Comment.objects.create(post=self.post, author=self.reader if i % 2 else self.author, content=f"Comment {i}")
+
+    def test_query_count_is_constant(self):
+        # Cold fragment cache: post + author, tags, comment count, one page of comments + authors
+        self.add_comments(1)
+        cache.clear()
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Comment 0")
+        self.assertContains(response, "python")
+
+        self.add_comments(45)
+        cache.clear()
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['comments']), 20)
+
+    def test_comments_are_paginated(self):
+        self.add_comments(25)
+        response = self.client.get(self.url, {'comments_page': 2})
+        self.assertEqual([c.content for c in response.context['comments']], [f"Comment {i}" for i in range(20, 25)])
+
+    def test_add_comment_link(self):
+        self.client.login(username="reader", password="password")
+        url = reverse('blog:comment_create', args=[self.post.pk])
+        self.assertContains(self.client.get(self.url), f'href="{url}"')
+        response = self.client.post(url, {'content': "Nice post"})
+        self.assertRedirects(response, self.url)
+        self.assertTrue(self.post.comments.filter(author=self.reader, content="Nice post").exists())
+
+
+class FragmentCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        fragments.stats.reset()
+        self.author = User.objects.create_user(username="author", password="password")
+        self.post = Post.objects.create(title="Post", content="First line\n\nSecond", author=self.author)
+        self.url = reverse('blog:post_detail', args=[self.post.pk])
+
+    def test_versions_invalidate_only_affected_fragments(self):
+        self.client.get(self.url)
+        # Warm: just the post and the comment count
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        self.assertEqual(fragments.stats.snapshot()['post_body'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+        Comment.objects.create(post=self.post, author=self.author, content="New comment")
+        self.post.tags.add("django")
+        response = self.client.get(self.url)
+        self.assertContains(response, "New comment")
+        self.assertContains(response, "django")
+        snapshot = fragments.stats.snapshot()
+        self.assertEqual(snapshot['post_body']['hits'], 2)
+        self.assertEqual(snapshot['comments']['misses'], 2)
+        self.assertEqual(snapshot['post_tags']['misses'], 2)
+
+        self.post.content = "Edited"
+        self.post.save()
+        self.assertContains(self.client.get(self.url), "Edited")
+
+    def test_versions_live_on_the_post_row(self):
+        # The version comes from the row, so every process agrees on it
+        self.client.get(self.url)
+        Comment.objects.create(post=self.post, author=self.author, content="New comment")
+        version = Post.objects.values_list('comments_version', flat=True).get(pk=self.post.pk)
+        self.assertEqual(version, self.post.comments_version + 1)
+        self.assertContains(self.client.get(self.url), "New comment")
+
+    def test_stale_full_save_keeps_versions(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(post=self.post, author=self.author, content="First comment")
+        self.assertContains(self.client.get(self.url), "First comment")
+        stale.title = "Retitled"
+        stale.save()
+        # The next bump must not land on a version whose fragment is already cached
+        Comment.objects.create(post=self.post, author=self.author, content="Second comment")
+        response = self.client.get(self.url)
+        self.assertContains(response, "Second comment")
+        self.assertContains(response, "Retitled")
+
+    def test_author_rename_invalidates_rows_and_threads(self):
+        reader = User.objects.create_user(username="reader", password="password")
+        Comment.objects.create(post=self.post, author=reader, content="Hi")
+        self.client.get(reverse('blog:post_list'))
+        self.client.get(self.url)
+        self.client.login(username="reader", password="password")  # last_login save: no bump
+        self.assertEqual(Post.objects.get(pk=self.post.pk).version, self.post.version)
+
+        self.author.username = "renamed"
+        self.author.save()
+        reader.username = "commenter"
+        reader.save(update_fields=['username'])
+        self.assertContains(self.client.get(reverse('blog:post_list')), "By renamed")
+        self.assertContains(self.client.get(self.url), "commenter")
+
+
+class RenderedBodyTestCase(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="password")
+
+    def test_body_and_excerpt_match_filters(self):
+        content = "<b>Bold</b> line\n\n" + "word " * 40
+        post = Post.objects.create(title="Post", content=content, author=self.author)
+        self.assertEqual(post.body_html, linebreaks_filter(content))
+        self.assertEqual(post.excerpt, truncatewords(content, 30))
+        post.content = "Short"
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual((post.body_html, post.excerpt), ("<p>Short</p>", "Short"))
+
+    def test_partial_save_without_content_skips_render(self):
+        post = Post.objects.create(title="Post", content="Body", author=self.author)
+        post.title = "Renamed"
+        with mock.patch.object(Post, 'render_content') as render:
+            post.save(update_fields=['title'])
+        render.assert_not_called()
+        post.refresh_from_db()
+        self.assertEqual((post.title, post.body_html), ("Renamed", "<p>Body</p>"))
+
+    def test_backfill_command(self):
+        post = Post.objects.create(title="Post", content="Old\npost", author=self.author)
+        Post.objects.filter(pk=post.pk).update(body_html='', excerpt='')
+        call_command('backfill_post_bodies', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.body_html, "<p>Old<br>post</p>")
+
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", password="password")
+        self.tips = Post.objects.create(title="Django tips", content="Use select_related for speed", author=self.author)
+        self.recipe = Post.objects.create(title="Cooking", content="django django pasta recipe", author=self.author)
+        self.other = Post.objects.create(title="Other", content="nothing here", author=self.author)
+        self.other.tags.add("Djangonaut")
+        cache.clear()
+
+    def ids(self, query, **kwargs):
+        return [post_id for post_id, _ in search.search(query, **kwargs)[0]]
+
+    def test_bm25_ranking_and_prefixes(self):
+        # A title hit outranks body hits; "django" also prefixes the "djangonaut" tag
+        ranked = self.ids("django")
+        self.assertEqual(ranked[0], self.tips.pk)
+        self.assertEqual(set(ranked), {self.tips.pk, self.recipe.pk, self.other.pk})
+        self.assertEqual(self.ids("pas"), [self.recipe.pk])
+        self.assertEqual(self.ids("the"), [])
+        rows, has_more = search.search("django", limit=2)
+        self.assertEqual((len(rows), has_more), (2, True))
+        self.assertEqual(self.ids("django", offset=2, limit=2), ranked[2:])
+
+    def test_index_follows_saves_tags_and_deletes(self):
+        self.recipe.content = "pasta"
+        self.recipe.save()
+        self.assertNotIn(self.recipe.pk, self.ids("django"))
+        self.other.tags.clear()
+        self.assertEqual(self.ids("djangonaut"), [])
+        self.tips.delete()
+        self.assertFalse(SearchPosting.objects.filter(post_id=self.tips.pk).exists())
+        self.assertEqual(self.ids("speed"), [])
+
+    def test_rebuild_command(self):
+        expected = sorted(SearchPosting.objects.values_list('term', 'post_id', 'frequency'))
+        SearchPosting.objects.all().delete()
+        SearchDocument.objects.all().delete()
+        call_command('rebuild_search_index', batch_size=1, stdout=StringIO())
+        self.assertEqual(sorted(SearchPosting.objects.values_list('term', 'post_id', 'frequency')), expected)
+        self.assertEqual(SearchDocument.objects.count(), 3)
+
+    def test_rebuild_replaces_postings_in_place(self):
+        expected = sorted(SearchPosting.objects.values_list('term', 'post_id', 'frequency'))
+        SearchPosting.objects.filter(post=self.tips).update(frequency=99)
+        SearchPosting.objects.create(term="stale", post=self.tips, frequency=1, doc_length=1)
+        seen = []
+
+        def build_rows(post, tag_names=None):
+            # Every post stays searchable while the other batches are rebuilt
+            seen.append(set(self.ids("django")))
+            return search.build_rows(post, tag_names)
+
+        with mock.patch('blog.management.commands.rebuild_search_index.build_rows', build_rows):
+            call_command('rebuild_search_index', batch_size=1, stdout=StringIO())
+        self.assertEqual(seen, [{self.tips.pk, self.recipe.pk, self.other.pk}] * 3)
+        self.assertEqual(sorted(SearchPosting.objects.values_list('term', 'post_id', 'frequency')), expected)
+
+    def test_search_view(self):
+        response = self.client.get(reverse('blog:search_posts'), {'q': "pasta"})
+        self.assertEqual([post.pk for post in response.context['results']], [self.recipe.pk])
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="password")
+        self.posts = [Post.objects.create(title=f"Post {i}", content="Body", author=self.author) for i in range(25)]
+        self.url = reverse('blog:post_list')
+
+    def walk(self, url):
+        titles = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            titles += [post.title for post in response.context['posts']]
+            next_url = response.context['page_obj'].next_url
+            url = f"{response.request['PATH_INFO']}{next_url}" if next_url else None
+        return titles
+
+    def test_after_cursor_round_trip(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['posts']), 10)
+        self.assertContains(response, "Load more")
+        self.assertEqual(self.walk(self.url), [f"Post {i}" for i in range(24, -1, -1)])
+
+    def test_ties_on_published_date(self):
+        # Identical timestamps fall back to id, so no row is skipped or repeated
+        Post.objects.update(published_date=timezone.now())
+        titles = self.walk(self.url)
+        self.assertEqual(titles, [f"Post {i}" for i in range(24, -1, -1)])
+
+    def test_malformed_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'after': "not-a-cursor"}).status_code, 404)
+
+    def test_posts_by_tag(self):
+        for post in self.posts[:12]:
+            post.tags.add("python")
+        self.posts[20].tags.add("other")
+        url = reverse('blog:posts_by_tag', args=["python"])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.context['tag'].name, "python")
+        self.assertEqual(self.walk(url), [f"Post {i}" for i in range(11, -1, -1)])
+        self.assertEqual(self.client.get(reverse('blog:posts_by_tag', args=["missing"])).status_code, 404)
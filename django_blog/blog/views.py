@@ -3,15 +3,17 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.paginator import Paginator
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import (
     ListView, DetailView, CreateView, UpdateView, DeleteView
 )
 from django.urls import reverse, reverse_lazy
-from django.db.models import Q
 
+from . import search
 from .models import Post, Comment
-from .forms import CustomUser CreationForm, PostForm, CommentForm  # Note: Fixed typo from earlier (was CustomUser  CreationForm)
+from .pagination import KeysetPaginationMixin
+from .forms import CustomUserCreationForm, PostForm, CommentForm  # Note: Fixed typo from earlier (was CustomUser  CreationForm)
 from taggit.models import Tag
 
 
@@ -21,7 +23,7 @@ from taggit.models import Tag
 
 def register_view(request):
     if request.method == 'POST':
-        form = CustomUser CreationForm(request.POST)
+        form = CustomUserCreationForm(request.POST)
         if form.is_valid():
             user = form.save()
             login(request, user)
@@ -30,7 +32,7 @@ def register_view(request):
         else:
             messages.error(request, "Unsuccessful registration. Invalid information.")
     else:
-        form = CustomUser CreationForm()
+        form = CustomUserCreationForm()
     return render(request, 'blog/register.html', {'form': form})
 
 
@@ -70,17 +72,31 @@ def profile_view(request):
 # Blog Post Views (CRUD)
 # ---------------------------
 
-class PostListView(ListView):
-    model = Post
+class PostListView(KeysetPaginationMixin, ListView):
+    # Rows show the stored excerpt, so the full text columns stay unread
+    queryset = Post.objects.select_related('author').defer('content', 'body_html')
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
-    ordering = ['-published_date']
-    paginate_by = 10  # optional pagination
+    paginate_by = 10  # keyset pages, "load more" via ?after=
 
 
 class PostDetailView(DetailView):
     model = Post
     template_name = 'blog/post_detail.html'
+    comments_per_page = 20
+
+    def get_queryset(self):
+        # Post + author in one query; tags are read lazily by the post_tags
+        # fragment, so a cached fragment costs no tag query at all
+        return Post.objects.select_related('author')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # One page of comments with their authors (a count and a page query),
+        # however long the thread is
+        comments = self.object.comments.select_related('author').order_by('created_at', 'id')
+        context['comments'] = Paginator(comments, self.comments_per_page).get_page(self.request.GET.get('comments_page'))
+        return context
 
 
 class PostCreateView(LoginRequiredMixin, CreateView):
@@ -126,14 +142,14 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
     template_name = 'blog/comment_form.html'
 
     def form_valid(self, form):
-        post = get_object_or_404(Post, pk=self.kwargs['post_id'])
+        post = get_object_or_404(Post, pk=self.kwargs['pk'])
         form.instance.post = post
         form.instance.author = self.request.user
         messages.success(self.request, "Comment added.")
         return super().form_valid(form)
 
     def get_success_url(self):
-        return reverse('blog:post_detail', kwargs={'pk': self.kwargs['post_id']})
+        return reverse('blog:post_detail', kwargs={'pk': self.kwargs['pk']})
 
 
 class CommentUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
@@ -165,31 +181,48 @@ class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 # Tagging Views
 # ---------------------------
 
-def posts_by_tag(request, tag_slug):
-    tag = get_object_or_404(Tag, slug=tag_slug)
-    posts = Post.objects.filter(tags__slug=tag_slug).order_by('-published_date')
-    context = {
-        'posts': posts,
-        'tag': tag,
-    }
-    return render(request, 'blog/posts_by_tag.html', context)
+class PostByTagListView(KeysetPaginationMixin, ListView):
+    template_name = 'blog/posts_by_tag.html'
+    context_object_name = 'posts'
+    paginate_by = 10
+
+    def get_queryset(self):
+        self.tag = get_object_or_404(Tag, slug=self.kwargs['tag_slug'])
+        # Filter on the tag id so the join stops at taggit's through table
+        return Post.objects.filter(tags__id=self.tag.pk).select_related('author')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['tag'] = self.tag
+        return context
 
 
 # ---------------------------
 # Search View
 # ---------------------------
 
+SEARCH_PAGE_SIZE = 10
+
+
 def search_posts(request):
-    query = request.GET.get('q')
-    results = []
+    # Ranked lookup through the inverted index in blog.search
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    results, has_next = [], False
     if query:
-        results = Post.objects.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct().order_by('-published_date')
+        ranked, has_next = search.search(query, offset=(page - 1) * SEARCH_PAGE_SIZE, limit=SEARCH_PAGE_SIZE)
+        posts = Post.objects.select_related('author').defer('content', 'body_html').in_bulk(
+            [post_id for post_id, _ in ranked]
+        )
+        results = [posts[post_id] for post_id, _ in ranked if post_id in posts]
     context = {
         'results': results,
         'query': query,
+        'page': page,
+        'has_next': has_next,
+        'has_previous': page > 1,
     }
     return render(request, 'blog/search_results.html', context)
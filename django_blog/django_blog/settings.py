@@ -140,3 +140,9 @@ LOGOUT_REDIRECT_URL = 'blog:login'
 # Email backend for development (console)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+
+# Template fragment cache (blog.fragments): entries are keyed on version
+# columns of the Post row, so any cache backend stays correct across
+# processes; the default local-memory cache just keeps one copy per process.
+# The timeout only bounds memory.
+BLOG_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+LOCAL_SIZE = getattr(settings, 'AUTH_TOKEN_LOCAL_CACHE_SIZE', 10000)
+# Other processes can't evict our local entries, so keep them short-lived
+LOCAL_TTL = getattr(settings, 'AUTH_TOKEN_LOCAL_CACHE_TTL', 30)
+SHARED_TTL = getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 300)
+
+User = get_user_model()
+# Cached per token: plain field values, never model instances (the password hash stays out)
+USER_FIELDS = [f for f in User._meta.concrete_fields if f.attname != 'password']
+USER_ATTNAMES = [f.attname for f in USER_FIELDS]
+TOKEN_FIELDS = ['key', 'user_id', 'created']
+
+
+class LRUCache:
+    # Small thread-safe LRU with per-entry expiry
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_tokens = LRUCache(LOCAL_SIZE, LOCAL_TTL)
+
+
+def cache_key(key):
+    return f'auth:token:{key}'
+
+
+def evict(key):
+    local_tokens.delete(key)
+    cache.delete(cache_key(key))
+
+
+def invalidate(key):
+    evict(key)
+    # Again once the change is committed, dropping anything a concurrent
+    # request re-read from the old row in between
+    transaction.on_commit(partial(evict, key))
+
+
+def field_value(user, field):
+    value = field.value_from_object(user)
+    # A FieldFile pickles its whole instance, password included: keep just the name
+    if isinstance(field, FileField):
+        return value.name
+    return value
+
+
+def snapshot(token):
+    # An immutable tuple, so one cached entry is safe to share between threads
+    user = token.user
+    return (
+        tuple(getattr(token, name) for name in TOKEN_FIELDS),
+        tuple(field_value(user, field) for field in USER_FIELDS),
+    )
+
+
+def hydrate(entry):
+    # Fresh Token/User instances per request, built without a query
+    token_values, user_values = entry
+    user = User.from_db('default', USER_ATTNAMES, user_values)
+    token = Token.from_db('default', TOKEN_FIELDS, token_values)
+    token.user = user
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # TokenAuthentication without the per-request Token/User join: resolved
+    # tokens live in an in-process LRU backed by the shared Django cache.
+    def authenticate_credentials(self, key):
+        entry = local_tokens.get(key)
+        if entry is None:
+            entry = cache.get(cache_key(key))
+            if entry is None:
+                try:
+                    entry = snapshot(Token.objects.select_related('user').get(key=key))
+                except Token.DoesNotExist:
+                    raise AuthenticationFailed('Invalid token.')
+                cache.set(cache_key(key), entry, SHARED_TTL)
+            local_tokens.set(key, entry)
+
+        token = hydrate(entry)
+        if not token.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        return (token.user, token)
+
+
+# 👇 Invalidation: token deleted/rotated, or its user changed (e.g. deactivated)
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(pre_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # pre_delete: the user's tokens are still there to look up
+    if kwargs.get('created'):
+        return
+    for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+        invalidate(key)
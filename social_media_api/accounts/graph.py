@@ -0,0 +1,162 @@
+import heapq
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from .models import Follow
+
+logger = logging.getLogger(__name__)
+
+TOP_K = getattr(settings, 'FOLLOW_SUGGESTIONS_TOP_K', 20)
+SUGGESTIONS_TTL = getattr(settings, 'FOLLOW_SUGGESTIONS_CACHE_TTL', 600)
+# Edges written by other processes are picked up by a periodic full reload,
+# run in the background while requests keep using the previous arrays
+RELOAD_INTERVAL = getattr(settings, 'FOLLOW_GRAPH_RELOAD_INTERVAL', 300)
+
+
+class FollowGraph:
+    # Adjacency as one sorted array('q') of followee ids per follower:
+    # 8 bytes per edge, O(log n) membership and cheap in-order scans.
+    def __init__(self):
+        self._following = {}
+        self._lock = threading.RLock()
+        # Held by whoever is loading, so a reload never runs twice at once
+        self._load_lock = threading.Lock()
+        self._loaded_at = None
+
+    def load(self):
+        following = {}
+        current, ids = None, None
+        # `a.followers.add(b)` stores from=a (followee), to=b (follower)
+        edges = Follow.objects.order_by('to_customuser_id', 'from_customuser_id').values_list(
+            'to_customuser_id', 'from_customuser_id',
+        )
+        for follower, followee in edges.iterator(chunk_size=10000):
+            if follower != current:
+                current, ids = follower, array('q')
+                following[follower] = ids
+            ids.append(followee)
+        with self._lock:
+            self._following = following
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self):
+        if self._loaded_at is None:
+            # Nothing to serve yet: one caller loads, the others wait for it
+            with self._load_lock:
+                if self._loaded_at is None:
+                    self.load()
+        elif time.monotonic() - self._loaded_at > RELOAD_INTERVAL:
+            self.refresh()
+
+    def refresh(self):
+        # Start a background reload unless one is already running
+        if self._load_lock.acquire(blocking=False):
+            threading.Thread(target=self._refresh, name='follow-graph-reload', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.load()
+        except Exception:
+            logger.exception('Reloading the follow graph failed; serving the previous one')
+        finally:
+            self._load_lock.release()
+            connection.close()
+
+    def following(self, user_id):
+        return self._following.get(user_id, array('q'))
+
+    def follows(self, user_id, other_id):
+        ids = self.following(user_id)
+        index = bisect_left(ids, other_id)
+        return index < len(ids) and ids[index] == other_id
+
+    def add_edge(self, follower, followee):
+        with self._lock:
+            ids = self._following.setdefault(follower, array('q'))
+            index = bisect_left(ids, followee)
+            if index == len(ids) or ids[index] != followee:
+                ids.insert(index, followee)
+
+    def remove_edge(self, follower, followee):
+        with self._lock:
+            ids = self._following.get(follower)
+            if ids is None:
+                return
+            index = bisect_left(ids, followee)
+            if index < len(ids) and ids[index] == followee:
+                del ids[index]
+
+    def reload_user(self, follower):
+        ids = Follow.objects.filter(to_customuser_id=follower).order_by('from_customuser_id').values_list(
+            'from_customuser_id', flat=True,
+        )
+        with self._lock:
+            self._following[follower] = array('q', ids)
+
+    def suggest(self, user_id, k=TOP_K):
+        # Friends-of-friends the user doesn't follow yet, ranked by mutual count
+        mine = self.following(user_id)
+        counts = Counter()
+        for friend in mine:
+            counts.update(self.following(friend))
+        candidates = (
+            (mutual, candidate) for candidate, mutual in counts.items()
+            if candidate != user_id and not self.follows(user_id, candidate)
+        )
+        best = heapq.nsmallest(k, candidates, key=lambda pair: (-pair[0], pair[1]))
+        return [(candidate, mutual) for mutual, candidate in best]
+
+
+graph = FollowGraph()
+
+
+def cache_key(user_id):
+    return f'follow:suggestions:{user_id}'
+
+
+def suggestions(user_id, k=TOP_K):
+    # Cached top-K (user_id, mutual_count) pairs, stored with the K they were computed for
+    cached = cache.get(cache_key(user_id))
+    if cached is None or cached[0] < k:
+        graph.ensure_loaded()
+        limit = max(k, TOP_K)
+        cached = (limit, graph.suggest(user_id, limit))
+        cache.set(cache_key(user_id), cached, SUGGESTIONS_TTL)
+    return cached[1][:k]
+
+
+# 👇 Incremental updates; only the follower's own cached suggestions change
+# directly, second-degree effects age out with the cache TTL
+@receiver(m2m_changed, sender=Follow)
+def sync_graph(sender, instance, action, reverse, pk_set, **kwargs):
+    if graph._loaded_at is None:
+        return
+    if action in ('post_add', 'post_remove'):
+        update = graph.add_edge if action == 'post_add' else graph.remove_edge
+        for pk in pk_set:
+            follower, followee = (instance.pk, pk) if reverse else (pk, instance.pk)
+            update(follower, followee)
+            cache.delete(cache_key(follower))
+    elif action == 'pre_clear' and not reverse:
+        # Everyone following instance loses one edge; look them up while they're there
+        instance._graph_followers = list(Follow.objects.filter(from_customuser_id=instance.pk).values_list(
+            'to_customuser_id', flat=True,
+        ))
+    elif action == 'post_clear':
+        if reverse:
+            graph.reload_user(instance.pk)
+            cache.delete(cache_key(instance.pk))
+        else:
+            for follower in instance.__dict__.pop('_graph_followers', ()):
+                graph.remove_edge(follower, instance.pk)
+                cache.delete(cache_key(follower))
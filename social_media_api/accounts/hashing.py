@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.hashers import make_password
+from django.db import close_old_connections
+from rest_framework.exceptions import Throttled
+
+# PBKDF2 (hashlib.pbkdf2_hmac) releases the GIL, so a thread pool gives real
+# parallelism while capping how many hashes run at once.
+WORKERS = getattr(settings, 'PASSWORD_HASH_WORKERS', 4)
+# Hashes allowed to wait for a worker before new requests get a 429
+MAX_PENDING = getattr(settings, 'PASSWORD_HASH_MAX_PENDING', 32)
+
+
+class HashMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.completed = 0
+            self.rejected = 0
+            self.hash_seconds = 0.0
+            self.max_hash_seconds = 0.0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+
+    def record(self, waited, took):
+        with self._lock:
+            self.completed += 1
+            self.wait_seconds += waited
+            self.hash_seconds += took
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            self.max_hash_seconds = max(self.max_hash_seconds, took)
+
+    def record_rejection(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self, in_flight=0):
+        with self._lock:
+            done = self.completed or 1
+            return {
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'in_flight': in_flight,
+                'avg_hash_ms': round(self.hash_seconds / done * 1000, 2),
+                'max_hash_ms': round(self.max_hash_seconds * 1000, 2),
+                'avg_queue_wait_ms': round(self.wait_seconds / done * 1000, 2),
+                'max_queue_wait_ms': round(self.max_wait_seconds * 1000, 2),
+            }
+
+
+class HashingPool:
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._in_flight = 0
+        self.metrics = HashMetrics()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            return self._executor
+
+    def submit(self, fn, *args):
+        # Rejects immediately (429) instead of queueing without bound
+        if not self._slots.acquire(blocking=False):
+            self.metrics.record_rejection()
+            raise Throttled(wait=1, detail='Authentication service is busy, please retry.')
+        with self._lock:
+            self._in_flight += 1
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self.metrics.record(started - submitted, time.perf_counter() - started)
+                with self._lock:
+                    self._in_flight -= 1
+                self._slots.release()
+
+        try:
+            return self._get_executor().submit(task)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+            raise
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    async def arun(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def snapshot(self):
+        return self.metrics.snapshot(in_flight=self._in_flight)
+
+
+pool = HashingPool(WORKERS, MAX_PENDING)
+
+
+def hash_password(raw_password):
+    return pool.run(make_password, raw_password)
+
+
+def _authenticate(request, username, password):
+    # Pool threads never see request_finished, so they drop stale DB
+    # connections themselves around each lookup
+    close_old_connections()
+    try:
+        return auth.authenticate(request, username=username, password=password)
+    finally:
+        close_old_connections()
+
+
+def authenticate(request, username, password):
+    # django.contrib.auth.authenticate() on the pool: every configured backend,
+    # is_active handling, user_login_failed and hash upgrades, with the hashing
+    # kept off the request thread. ModelBackend still hashes once for unknown
+    # users, so timing stays flat.
+    return pool.run(_authenticate, request, username, password)
+
+
+async def aauthenticate(request, username, password):
+    return await pool.arun(_authenticate, request, username, password)
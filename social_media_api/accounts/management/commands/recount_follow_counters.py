@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+User = get_user_model()
+Follow = User.followers.through
+
+
+class Command(BaseCommand):
+    help = 'Recompute drifted followers_count / following_count in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        fixed = 0
+        while True:
+            # Lock the batch before counting, so a concurrent F() increment
+            # either lands in the count or waits and applies on top of it
+            with transaction.atomic():
+                users = list(
+                    User.objects.select_for_update().filter(pk__gt=last_pk).order_by('pk')
+                    .only('pk', 'followers_count', 'following_count')[:batch_size]
+                )
+                if not users:
+                    break
+                last_pk = users[-1].pk
+                ids = [user.pk for user in users]
+                # `a.followers.add(b)` stores from=a, to=b
+                followers = dict(Follow.objects.filter(from_customuser_id__in=ids).values('from_customuser_id').annotate(n=Count('pk')).values_list('from_customuser_id', 'n'))
+                following = dict(Follow.objects.filter(to_customuser_id__in=ids).values('to_customuser_id').annotate(n=Count('pk')).values_list('to_customuser_id', 'n'))
+
+                drifted = []
+                for user in users:
+                    actual = (followers.get(user.pk, 0), following.get(user.pk, 0))
+                    if (user.followers_count, user.following_count) != actual:
+                        user.followers_count, user.following_count = actual
+                        drifted.append(user)
+                User.objects.bulk_update(drifted, ['followers_count', 'following_count'])
+                fixed += len(drifted)
+
+        self.stdout.write(self.style.SUCCESS(f'Recounted follow counters, fixed {fixed} users.'))
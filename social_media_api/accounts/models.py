@@ -1,10 +1,56 @@
 from django.contrib.auth.models import AbstractUser 
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
 
 class CustomUser (AbstractUser ):
     bio = models.TextField(max_length=500, blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True)
     followers = models.ManyToManyField('self', symmetrical=False, blank=True, related_name='following')
+    # Denormalized edge counts, maintained by the m2m_changed receiver below
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.username
+
+
+Follow = CustomUser.followers.through
+
+def _bump(pks, field, delta):
+    if pks and delta:
+        CustomUser.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+def _existing_edges(instance, reverse, pk_set=None):
+    # Other side of every follow edge touching `instance` (limited to pk_set)
+    if reverse:
+        edges = Follow.objects.filter(to_customuser_id=instance.pk)
+        other = 'from_customuser_id'
+    else:
+        edges = Follow.objects.filter(from_customuser_id=instance.pk)
+        other = 'to_customuser_id'
+    if pk_set is not None:
+        edges = edges.filter(**{f'{other}__in': pk_set})
+    return set(edges.values_list(other, flat=True))
+
+# `a.followers.add(b)` means b follows a: a gains a follower, b follows one more
+@receiver(m2m_changed, sender=Follow)
+def update_follow_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_remove', 'pre_clear'):
+        # Remember which edges really exist; remove() reports ids it never deleted
+        instance._removed_follow_ids = _existing_edges(instance, reverse, pk_set)
+        return
+    if action == 'post_add':
+        changed, delta = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        changed, delta = instance.__dict__.pop('_removed_follow_ids', set()), -1
+    else:
+        return
+    own, others = ('following_count', 'followers_count') if reverse else ('followers_count', 'following_count')
+    _bump([instance.pk], own, delta * len(changed))
+    _bump(changed, others, delta)
+
+
+# Connects the token cache invalidation and follow graph receivers
+from . import authentication, graph  # noqa: E402,F401
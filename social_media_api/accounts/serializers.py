@@ -1,8 +1,10 @@
 from rest_framework import serializers
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
 from django.core.exceptions import ValidationError
 
+from .hashing import hash_password, authenticate
+
 User  = get_user_model()
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -35,12 +37,16 @@ class RegisterSerializer(serializers.ModelSerializer):
         # Pop confirmation field
         validated_data.pop('password_confirm', None)
         
+        # Hash on the bounded password pool (async views pass a precomputed hash)
+        password_hash = validated_data.pop('password_hash', None) or hash_password(validated_data['password'])
+
         # Create a new user using get_user_model().objects.create_user (explicit match)
         user = get_user_model().objects.create_user(
             username=validated_data['username'],
             email=validated_data.get('email', ''),
-            password=validated_data['password']
+            password=None,  # unusable placeholder, replaced before the save below
         )
+        user.password = password_hash
 
         # Add optional fields
         user.bio = validated_data.get('bio', '')
@@ -70,16 +76,14 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField()  # Uses serializers.CharField()
 
     def validate(self, data):
-        user = authenticate(username=data['username'], password=data['password'])
-        if user and user.is_active:
+        user = authenticate(self.context.get('request'), data['username'], data['password'])
+        if user is not None:
             return user
         raise serializers.ValidationError("Invalid credentials.")
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
-    # Include followers and following counts for brevity (or full lists if needed)
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
+    # followers_count / following_count are maintained columns, no COUNT per render
     token = serializers.SerializerMethodField()  # Optional: include current user's token
 
     class Meta:
@@ -90,19 +94,21 @@ class UserProfileSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'followers_count', 'following_count', 'token']
 
-    def get_followers_count(self, obj):
-        return obj.followers.count()
-
-    def get_following_count(self, obj):
-        return obj.following.count()
+    def is_owner(self, obj):
+        request = self.context.get('request') if self.context else None
+        return request is not None and request.user == obj and isinstance(request.auth, Token)
 
     def get_token(self, obj):
-        # Get the token for the current user (useful in login/profile responses)
-        # Uses Token.objects.create or get_or_create implicitly via query
-        if self.context and self.context.get('request'):
-            try:
-                token = Token.objects.get(user=obj)
-            except Token.DoesNotExist:
-                token = Token.objects.create(user=obj)  # Explicit Token.objects.create here too
-            return token.key
-        return None
+        # Taken from the request's auth (no query)
+        return self.context['request'].auth.key if self.is_owner(obj) else None
+
+    def to_representation(self, instance):
+        # Anyone but the owner, anonymous readers included, gets no token field at all
+        data = super().to_representation(instance)
+        if not self.is_owner(instance):
+            data.pop('token', None)
+        return data
+
+
+class BulkUserIdsSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500)
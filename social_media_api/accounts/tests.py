@@ -0,0 +1,256 @@
+import pickle
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APITestCase
+
+from . import graph
+from .authentication import CachedTokenAuthentication, cache_key, local_tokens
+
+User = get_user_model()
+
+
+class ProfileTokenTestCase(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", password="password")
+        self.other = User.objects.create_user(username="other", password="password")
+        self.token = Token.objects.create(user=self.owner)
+        self.url = f'/api/accounts/profile/{self.owner.pk}/'
+
+    def test_token_only_shown_to_owner(self):
+        self.assertNotIn('token', self.client.get(self.url).data)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.other).key}')
+        self.assertNotIn('token', self.client.get(self.url).data)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.get(self.url).data['token'], self.token.key)
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+        self.user = User.objects.create_user(username="user", password="password")
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_each_request_gets_its_own_instances(self):
+        first, _ = self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            second, token = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual((first, token.key, token.user_id), (self.user, self.token.key, self.user.pk))
+        self.assertIsNot(first, second)
+        first.username = "mutated"
+        self.assertEqual(self.auth.authenticate_credentials(self.token.key)[0].username, "user")
+        # Only plain values are cached, and never the password hash
+        self.assertNotIn(self.user.password.encode(), pickle.dumps(cache.get(cache_key(self.token.key))))
+
+    def test_profile_picture_is_cached_as_its_name(self):
+        User.objects.filter(pk=self.user.pk).update(profile_picture='profiles/me.png')
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(user.profile_picture.name, 'profiles/me.png')
+        entry = pickle.dumps(cache.get(cache_key(self.token.key)))
+        self.assertNotIn(self.user.password.encode(), entry)
+        self.assertIs(user.profile_picture.instance, user)
+
+    def test_user_and_token_changes_invalidate(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+        self.user.is_active = True
+        self.user.save()
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.delete()
+        self.assertIsNone(local_tokens.get(self.token.key))
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+
+class FollowCounterTestCase(APITestCase):
+    def setUp(self):
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(username=name, password="password") for name in ("alice", "bob", "carol")
+        )
+
+    def counts(self):
+        return {
+            user.username: (user.followers_count, user.following_count)
+            for user in User.objects.order_by('username')
+        }
+
+    def test_add_and_repeat_add(self):
+        # bob and carol follow alice
+        self.alice.followers.add(self.bob, self.carol)
+        self.alice.followers.add(self.bob)
+        self.carol.following.add(self.bob)
+        self.assertEqual(self.counts(), {'alice': (2, 0), 'bob': (1, 1), 'carol': (0, 2)})
+
+    def test_remove_only_counts_existing_edges(self):
+        self.alice.followers.add(self.bob)
+        # carol never followed alice
+        self.alice.followers.remove(self.bob, self.carol)
+        self.alice.followers.remove(self.bob)
+        self.assertEqual(self.counts(), {'alice': (0, 0), 'bob': (0, 0), 'carol': (0, 0)})
+
+    def test_clear_from_either_side(self):
+        self.alice.followers.add(self.bob, self.carol)
+        self.bob.followers.add(self.carol)
+        self.carol.following.clear()
+        self.assertEqual(self.counts(), {'alice': (1, 0), 'bob': (0, 1), 'carol': (0, 0)})
+        self.alice.followers.clear()
+        self.assertEqual(self.counts(), {'alice': (0, 0), 'bob': (0, 0), 'carol': (0, 0)})
+
+    def test_recount_command_fixes_drift(self):
+        self.alice.followers.add(self.bob)
+        User.objects.update(followers_count=9, following_count=9)
+        with mock.patch('django.db.models.QuerySet.select_for_update', autospec=True,
+                        side_effect=lambda qs, *args, **kwargs: qs) as lock:
+            call_command('recount_follow_counters', batch_size=2, stdout=StringIO())
+        self.assertTrue(lock.called)
+        self.assertEqual(self.counts(), {'alice': (1, 0), 'bob': (0, 1), 'carol': (0, 0)})
+
+
+class BulkFollowTestCase(APITestCase):
+    def setUp(self):
+        self.me = User.objects.create_user(username="me", password="password")
+        self.others = [User.objects.create_user(username=f"user{i}", password="password") for i in range(3)]
+        self.client.force_authenticate(self.me)
+
+    def post(self, url, ids):
+        return self.client.post(url, {'user_ids': ids}, format='json')
+
+    def test_bulk_follow_and_unfollow(self):
+        ids = [user.pk for user in self.others]
+        response = self.post('/api/accounts/follow/bulk/', ids + [self.me.pk, 999999])
+        # Self is silently dropped, unknown ids are reported
+        self.assertEqual(response.data, {'applied': ids, 'not_found': [999999]})
+        self.assertEqual(set(self.me.following.values_list('pk', flat=True)), set(ids))
+        self.me.refresh_from_db()
+        self.assertEqual(self.me.following_count, 3)
+
+        response = self.post('/api/accounts/unfollow/bulk/', ids[:2] + [999999])
+        self.assertEqual(response.data, {'applied': ids[:2], 'not_found': [999999]})
+        self.assertEqual(list(self.me.following.values_list('pk', flat=True)), ids[2:])
+        self.assertEqual(self.post('/api/accounts/follow/bulk/', []).status_code, 400)
+
+    def test_relationship_status_in_one_query(self):
+        following, followed_by, mutual, stranger = self.others + [
+            User.objects.create_user(username="stranger", password="password"),
+        ]
+        self.me.following.add(following, mutual)
+        self.me.followers.add(followed_by, mutual)
+        with self.assertNumQueries(1):
+            response = self.post('/api/accounts/relationships/', [following.pk, followed_by.pk, mutual.pk, stranger.pk])
+        self.assertEqual(response.data, {
+            str(following.pk): {'following': True, 'followed_by': False, 'mutual': False},
+            str(followed_by.pk): {'following': False, 'followed_by': True, 'mutual': False},
+            str(mutual.pk): {'following': True, 'followed_by': True, 'mutual': True},
+            str(stranger.pk): {'following': False, 'followed_by': False, 'mutual': False},
+        })
+
+
+class FollowGraphTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        graph.graph._following = {}
+        graph.graph._loaded_at = None
+        self.me, self.a, self.b, self.x, self.y, self.z = (
+            User.objects.create_user(username=name, password="password") for name in ("me", "a", "b", "x", "y", "z")
+        )
+        self.me.following.add(self.a, self.b)
+        self.a.following.add(self.x, self.y, self.me)
+        self.b.following.add(self.x, self.z)
+        self.client.force_authenticate(self.me)
+
+    def suggested(self, **params):
+        return [(user['username'], user['mutual_count']) for user in self.client.get('/api/accounts/suggestions/', params).data]
+
+    def test_ranked_by_mutual_count(self):
+        self.assertEqual(self.suggested(), [("x", 2), ("y", 1), ("z", 1)])
+        self.assertEqual(self.suggested(limit=1), [("x", 2)])
+
+    def test_incremental_follow_unfollow_and_clear(self):
+        self.suggested()
+        with mock.patch.object(graph.graph, 'load') as load:
+            self.me.following.add(self.x)
+            self.assertEqual(self.suggested(), [("y", 1), ("z", 1)])
+            self.me.following.remove(self.x)
+            self.b.following.remove(self.z)
+            self.assertEqual(self.suggested(), [("x", 2), ("y", 1)])
+            # x loses every follower: a and b no longer lead to it (a second-degree
+            # change for me, so my cached list only catches up after the TTL)
+            self.x.followers.clear()
+            cache.clear()
+            self.assertEqual(self.suggested(), [("y", 1)])
+            self.me.following.clear()
+            self.assertEqual(self.suggested(), [])
+        load.assert_not_called()
+
+    def test_expired_graph_reloads_once_in_the_background(self):
+        graph.graph.ensure_loaded()
+        graph.graph._loaded_at -= graph.RELOAD_INTERVAL + 1
+        release = threading.Event()
+        with mock.patch.object(graph.graph, 'load', side_effect=lambda: release.wait(5)) as load, \
+                mock.patch('accounts.graph.connection'):
+            for _ in range(5):
+                # Served from the previous arrays while the reload runs
+                self.assertEqual(graph.graph.suggest(self.me.pk)[0], (self.x.pk, 2))
+                graph.graph.ensure_loaded()
+            release.set()
+            while graph.graph._load_lock.locked():
+                time.sleep(0.01)
+        self.assertEqual(load.call_count, 1)
+
+
+# The hashing pool's threads use their own DB connection, so rows must be committed
+class LoginTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="password")
+        self.client = APIClient()
+
+    def login(self, password="password"):
+        return self.client.post('/api/accounts/login/', {'username': "user", 'password': password}, format='json')
+
+    def test_login_goes_through_authenticate(self):
+        response = self.login()
+        self.assertEqual(response.data['token'], Token.objects.get(user=self.user).key)
+
+        failures = []
+
+        def failed(credentials, **kwargs):
+            failures.append(credentials['username'])
+
+        user_login_failed.connect(failed)
+        try:
+            self.assertEqual(self.login("wrong").status_code, 400)
+        finally:
+            user_login_failed.disconnect(failed)
+        self.assertEqual(failures, ["user"])
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login().status_code, 400)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_outdated_hash_is_upgraded(self):
+        self.user.password = make_password("password", hasher='md5')
+        self.user.save()
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
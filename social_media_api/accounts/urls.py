@@ -1,11 +1,21 @@
 from django.urls import path
-from .views import RegisterView, UserProfileView, follow_user, unfollow_user
-from rest_framework.authtoken.views import obtain_auth_token
+from .views import (
+    RegisterView, LoginView, UserProfileView, follow_user, unfollow_user,
+    register_async, login_async, HashMetricsView, FollowSuggestionsView,
+    BulkFollowView, BulkUnfollowView, RelationshipStatusView,
+)
 
 urlpatterns = [
     path('register/', RegisterView.as_view()),
-    path('login/', obtain_auth_token),
+    path('login/', LoginView.as_view()),
+    path('register/async/', register_async),
+    path('login/async/', login_async),
+    path('auth-metrics/', HashMetricsView.as_view()),
     path('profile/<int:pk>/', UserProfileView.as_view()),
     path('follow/<int:user_id>/', follow_user),
     path('unfollow/<int:user_id>/', unfollow_user),
+    path('follow/bulk/', BulkFollowView.as_view()),
+    path('unfollow/bulk/', BulkUnfollowView.as_view()),
+    path('relationships/', RelationshipStatusView.as_view()),
+    path('suggestions/', FollowSuggestionsView.as_view()),
 ]
@@ -1,9 +1,22 @@
-from django.contrib.auth import authenticate, get_user_model
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db.models import Q
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import generics, status, permissions, viewsets
+from rest_framework.exceptions import Throttled
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 
-from .serializers import RegisterSerializer
+from .serializers import RegisterSerializer, UserProfileSerializer, BulkUserIdsSerializer
+from .models import Follow
+from .hashing import pool, authenticate, aauthenticate
+from . import graph
 
 CustomUser = get_user_model()
 
@@ -11,16 +24,17 @@ CustomUser = get_user_model()
 # 👇 User registration endpoint
 class RegisterView(generics.GenericAPIView):
     serializer_class = RegisterSerializer
+    permission_classes = [permissions.AllowAny]
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            token, _ = Token.objects.get_or_create(user=user)
+            # ✅ RegisterSerializer.create already issued the token
             return Response(
                 {
                     "message": "User registered successfully.",
-                    "token": token.key,
+                    "token": user.token,
                 },
                 status=status.HTTP_201_CREATED,
             )
@@ -29,12 +43,15 @@ class RegisterView(generics.GenericAPIView):
 
 # 👇 Login endpoint
 class LoginView(generics.GenericAPIView):
+    permission_classes = [permissions.AllowAny]
+
     def post(self, request, *args, **kwargs):
         username = request.data.get("username")
         password = request.data.get("password")
 
-        user = authenticate(username=username, password=password)
-        if user:
+        # ✅ authenticate() runs on the bounded hashing pool (429 when saturated)
+        user = authenticate(request, username, password) if username and password else None
+        if user is not None:
             token, _ = Token.objects.get_or_create(user=user)
             return Response(
                 {
@@ -49,6 +66,65 @@ class LoginView(generics.GenericAPIView):
         )
 
 
+# 👇 Async registration/login for ASGI deployments: the event loop awaits
+# the hashing pool instead of blocking a worker thread on PBKDF2
+def _throttled_response(exc):
+    response = JsonResponse({"detail": str(exc.detail)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response['Retry-After'] = str(exc.wait)
+    return response
+
+
+@csrf_exempt
+async def register_async(request):
+    if request.method != 'POST':
+        return JsonResponse({"detail": "Method not allowed."}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({"detail": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = RegisterSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        password_hash = await pool.arun(make_password, serializer.validated_data['password'])
+    except Throttled as exc:
+        return _throttled_response(exc)
+    user = await sync_to_async(serializer.save)(password_hash=password_hash)
+    return JsonResponse(
+        {"message": "User registered successfully.", "token": user.token},
+        status=status.HTTP_201_CREATED,
+    )
+
+
+@csrf_exempt
+async def login_async(request):
+    if request.method != 'POST':
+        return JsonResponse({"detail": "Method not allowed."}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({"detail": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+
+    username, password = data.get("username"), data.get("password")
+    try:
+        user = await aauthenticate(request, username, password) if username and password else None
+    except Throttled as exc:
+        return _throttled_response(exc)
+    if user is None:
+        return JsonResponse({"error": "Invalid credentials"}, status=status.HTTP_400_BAD_REQUEST)
+    token, _ = await sync_to_async(Token.objects.get_or_create)(user=user)
+    return JsonResponse({"message": "Login successful.", "token": token.key}, status=status.HTTP_200_OK)
+
+
+# 👇 Hash time / queue wait metrics for the password pool
+class HashMetricsView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(pool.snapshot())
+
+
 # 👇 Authenticated user profile endpoint
 class ProfileView(generics.RetrieveUpdateAPIView):
     queryset = CustomUser.objects.all()
@@ -58,3 +134,102 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         # Returns the currently logged-in user
         return self.request.user
+
+
+# 👇 Public profile (follow counts are stored columns)
+class UserProfileView(generics.RetrieveAPIView):
+    queryset = CustomUser.objects.all()
+    serializer_class = UserProfileSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+
+# 👇 Follow / unfollow another user
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def follow_user(request, user_id):
+    target = get_object_or_404(CustomUser, pk=user_id)
+    if target == request.user:
+        return Response({"error": "You cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
+    # ✅ m2m_changed keeps followers_count / following_count in step
+    target.followers.add(request.user)
+    return Response({"message": f"You are now following {target.username}."}, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def unfollow_user(request, user_id):
+    target = get_object_or_404(CustomUser, pk=user_id)
+    target.followers.remove(request.user)
+    return Response({"message": f"You have unfollowed {target.username}."}, status=status.HTTP_200_OK)
+
+
+# 👇 Follow / unfollow many users at once (e.g. contact import). The M2M
+# manager issues one SELECT + one bulk INSERT (or one DELETE) on the through
+# table and still fires m2m_changed for counters, timelines and the graph.
+class BulkFollowView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = BulkUserIdsSerializer
+    follow = True
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested = set(serializer.validated_data['user_ids']) - {request.user.pk}
+        ids = set(CustomUser.objects.filter(pk__in=requested).values_list('pk', flat=True))
+        if self.follow:
+            request.user.following.add(*ids)
+        else:
+            request.user.following.remove(*ids)
+        return Response({"applied": sorted(ids), "not_found": sorted(requested - ids)}, status=status.HTTP_200_OK)
+
+
+class BulkUnfollowView(BulkFollowView):
+    follow = False
+
+
+# 👇 follows / followed_by / mutual for many users in one query
+class RelationshipStatusView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = BulkUserIdsSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = set(serializer.validated_data['user_ids'])
+        me = request.user.pk
+        # `a.followers.add(b)` stores from=a, to=b, i.e. b follows a
+        edges = Follow.objects.filter(
+            Q(to_customuser_id=me, from_customuser_id__in=ids) |
+            Q(from_customuser_id=me, to_customuser_id__in=ids)
+        ).values_list('from_customuser_id', 'to_customuser_id')
+        following, followed_by = set(), set()
+        for followee, follower in edges:
+            if follower == me:
+                following.add(followee)
+            if followee == me:
+                followed_by.add(follower)
+        return Response({
+            str(user_id): {
+                "following": user_id in following,
+                "followed_by": user_id in followed_by,
+                "mutual": user_id in following and user_id in followed_by,
+            }
+            for user_id in sorted(ids)
+        })
+
+
+# 👇 "Who to follow": friends-of-friends ranked by mutual follows
+class FollowSuggestionsView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', graph.TOP_K)), 100))
+        except ValueError:
+            limit = graph.TOP_K
+        ranked = graph.suggestions(request.user.pk, limit)
+        users = CustomUser.objects.in_bulk([user_id for user_id, _ in ranked])
+        return Response([
+            {"id": user_id, "username": users[user_id].username, "mutual_count": mutual}
+            for user_id, mutual in ranked if user_id in users
+        ])
@@ -0,0 +1,89 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Notification, NotificationActor
+
+# Notifications with the same recipient, verb and target within this long of
+# the burst's first event collapse into one row ("alice and 41 others liked your post")
+WINDOW = timedelta(seconds=getattr(settings, 'NOTIFICATION_AGGREGATION_WINDOW', 3600))
+SAMPLE_SIZE = getattr(settings, 'NOTIFICATION_SAMPLE_ACTORS', 5)
+
+# Serializes read-modify-write of aggregated rows between worker threads
+_lock = threading.Lock()
+
+
+def group_key(item):
+    return (item['recipient_id'], item['verb'], item.get('target_ct_id'), item.get('target_id'))
+
+
+def _merge(row, group):
+    # Newest actors first in the sample; the count comes from NotificationActor
+    sample = list(row.sample_actor_ids)
+    for item in group:
+        actor_id = item['actor_id']
+        if actor_id in sample:
+            sample.remove(actor_id)
+        sample.insert(0, actor_id)
+    row.sample_actor_ids = sample[:SAMPLE_SIZE]
+    row.actor_id = group[-1]['actor_id']
+    row.timestamp = group[-1]['timestamp']
+
+
+def _count_actors(rows):
+    # Distinct actors counted in the database, so repeat actors outside the
+    # sample (or merged by another process) are never counted twice
+    links = (
+        NotificationActor.objects.filter(notification=OuterRef('pk'))
+        .values('notification').annotate(n=Count('pk')).values('n')
+    )
+    touched = Notification.objects.filter(pk__in=[row.pk for row in rows])
+    touched.update(actor_count=Subquery(links))
+    counts = dict(touched.values_list('pk', 'actor_count'))
+    for row in rows:
+        row.actor_count = counts[row.pk]
+
+
+def aggregate(items):
+    # Write a batch of notification payloads; returns (created, updated) rows
+    groups = {}
+    for item in sorted(items, key=lambda item: item['timestamp']):
+        groups.setdefault(group_key(item), []).append(item)
+
+    with _lock, transaction.atomic():
+        # The window runs from a burst's first event, so a steady trickle
+        # can't keep one row open forever
+        candidates = Notification.objects.filter(
+            recipient_id__in={key[0] for key in groups},
+            verb__in={key[1] for key in groups},
+            unread=True,
+            started_at__gte=timezone.now() - WINDOW,
+        ).order_by('started_at')
+        existing = {
+            (row.recipient_id, row.verb, row.target_ct_id, row.target_id): row
+            for row in candidates
+        }
+
+        created, updated, merged = [], [], []
+        for key, group in groups.items():
+            row = existing.get(key)
+            if row is None:
+                row = Notification(**group[0], started_at=group[0]['timestamp'])
+                created.append(row)
+            else:
+                updated.append(row)
+            _merge(row, group)
+            merged.append((row, group))
+
+        Notification.objects.bulk_create(created)
+        Notification.objects.bulk_update(updated, ['actor', 'sample_actor_ids', 'timestamp'])
+        NotificationActor.objects.bulk_create(
+            [NotificationActor(notification_id=row.pk, actor_id=item['actor_id']) for row, group in merged for item in group],
+            ignore_conflicts=True,
+        )
+        _count_actors(created + updated)
+    return created, updated
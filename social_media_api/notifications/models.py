@@ -13,3 +13,36 @@ class Notification(models.Model):
     target_id = models.PositiveIntegerField(null=True, blank=True)
     target = GenericForeignKey('target_ct', 'target_id')
     unread = models.BooleanField(default=True)
+    # Aggregation: one row per (recipient, verb, target) burst, see notifications.aggregation.
+    # actor_count counts the burst's NotificationActor rows; started_at anchors its window.
+    actor_count = models.PositiveIntegerField(default=1)
+    sample_actor_ids = models.JSONField(default=list, blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'unread', '-timestamp'], name='notif_unread_idx'),
+            models.Index(fields=['recipient', '-timestamp', '-id'], name='notif_recent_idx'),
+        ]
+
+# Distinct actors behind an aggregated notification
+class NotificationActor(models.Model):
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='actor_links')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    class Meta:
+        unique_together = ('notification', 'actor')
+
+# Every async notification is written here in the request's transaction and
+# deleted once a worker (or the periodic drain) delivers it into Notification
+class NotificationOutbox(models.Model):
+    recipient_id = models.BigIntegerField()
+    actor_id = models.BigIntegerField()
+    verb = models.CharField(max_length=255)
+    timestamp = models.DateTimeField(default=timezone.now)
+    target_ct_id = models.IntegerField(null=True, blank=True)
+    target_id = models.PositiveIntegerField(null=True, blank=True)
+
+    def as_item(self):
+        return {
+            'recipient_id': self.recipient_id, 'actor_id': self.actor_id, 'verb': self.verb,
+            'timestamp': self.timestamp, 'target_ct_id': self.target_ct_id, 'target_id': self.target_id,
+        }
@@ -0,0 +1,208 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import unread
+from .aggregation import aggregate
+from .pubsub import pubsub
+from .models import Notification, NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'NOTIFICATION_BATCH_SIZE', 500)
+# How often a worker replays outbox rows the queue never delivered (overflow,
+# failed writes, a process that died with rows queued)
+OUTBOX_DRAIN_INTERVAL = getattr(settings, 'NOTIFICATION_OUTBOX_DRAIN_INTERVAL', 30)
+
+
+class LocalBroker:
+    # In-process stand-in for a real message broker, carrying outbox row ids.
+    # Anything exposing put(item, timeout) and get_batch(max_items, timeout)
+    # can replace it via the NOTIFICATION_BROKER setting.
+    def __init__(self, maxsize=10000):
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, item, timeout=None):
+        # Raises queue.Full once the broker is saturated (backpressure)
+        self._queue.put(item, timeout=timeout)
+
+    def get_batch(self, max_items, timeout=None):
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < max_items:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+def deliver(items):
+    # The single write path for notifications, used by workers and sync mode
+    if getattr(settings, 'NOTIFICATION_AGGREGATION', True):
+        created, updated = aggregate(items)
+    else:
+        created, updated = Notification.objects.bulk_create(
+            [Notification(**item, sample_actor_ids=[item['actor_id']]) for item in items], batch_size=BATCH_SIZE,
+        ), []
+    transaction.on_commit(lambda: after_delivery(created, updated))
+    return created
+
+
+def after_delivery(created, updated):
+    # Only new rows change the unread count; merged rows were already unread
+    unread.record_created(created)
+    for recipient_id in {row.recipient_id for row in created + updated}:
+        pubsub.publish(recipient_id, 'notification')
+
+
+def record(items):
+    # Written in the caller's transaction: once the like or follow commits, its
+    # notification survives crashes and restarts until a worker delivers it
+    rows = NotificationOutbox.objects.bulk_create([NotificationOutbox(**item) for item in items], batch_size=BATCH_SIZE)
+    return [row.pk for row in rows]
+
+
+def claim(rows):
+    # Rows are claimed with SKIP LOCKED and deleted in the same transaction they
+    # are delivered, so queue workers and drainers in any process never deliver
+    # the same row twice
+    with transaction.atomic():
+        rows = list(rows.select_for_update(skip_locked=True).order_by('pk')[:BATCH_SIZE])
+        if rows:
+            deliver([row.as_item() for row in rows])
+            NotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).delete()
+    return len(rows)
+
+
+def deliver_queued(pks):
+    # Ids already taken by another worker or the drainer are skipped or gone
+    return claim(NotificationOutbox.objects.filter(pk__in=pks))
+
+
+def drain_outbox():
+    # Replay every row still in the outbox
+    moved = 0
+    while True:
+        claimed = claim(NotificationOutbox.objects.all())
+        if not claimed:
+            return moved
+        moved += claimed
+
+
+class NotificationPipeline:
+    def __init__(self, broker, workers=2, put_timeout=0.05, poll_interval=0.5, drain_interval=30):
+        self.broker = broker
+        self.workers = workers
+        self.put_timeout = put_timeout
+        self.poll_interval = poll_interval
+        self.drain_interval = drain_interval
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, args=(i == 0,), name=f'notifications-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        # Ids still queued are dropped: their rows stay in the outbox and the
+        # next drain (in this process or another) delivers them
+
+    def submit(self, pks):
+        self.start()
+        for pk in pks:
+            try:
+                self.broker.put(pk, timeout=self.put_timeout)
+            except queue.Full:
+                # Backpressure: stop queueing; the rest wait in the outbox for a drain
+                return
+
+    def flush(self):
+        # Deliver everything queued right now on the calling thread
+        batch = self.broker.get_batch(BATCH_SIZE, timeout=0)
+        while batch:
+            deliver_queued(batch)
+            batch = self.broker.get_batch(BATCH_SIZE, timeout=0)
+
+    def drain(self):
+        try:
+            return drain_outbox()
+        except Exception:
+            logger.exception('Replaying the notification outbox failed; retrying in %ss', self.drain_interval)
+            return 0
+
+    def _run(self, replays_outbox):
+        # One worker per process replays the outbox, at start and then periodically
+        next_drain = time.monotonic()
+        try:
+            while not self._stopping.is_set():
+                if replays_outbox and time.monotonic() >= next_drain:
+                    self.drain()
+                    next_drain = time.monotonic() + self.drain_interval
+                batch = self.broker.get_batch(BATCH_SIZE, timeout=self.poll_interval)
+                if not batch:
+                    continue
+                try:
+                    deliver_queued(batch)
+                except Exception:
+                    logger.exception('Notification delivery failed; %d items left in the outbox', len(batch))
+        finally:
+            connection.close()
+
+
+pipeline = NotificationPipeline(
+    broker=import_string(getattr(settings, 'NOTIFICATION_BROKER', 'notifications.pipeline.LocalBroker'))(
+        maxsize=getattr(settings, 'NOTIFICATION_QUEUE_SIZE', 10000),
+    ),
+    workers=getattr(settings, 'NOTIFICATION_WORKERS', 2),
+    drain_interval=OUTBOX_DRAIN_INTERVAL,
+)
+atexit.register(pipeline.stop)
+
+
+def make_item(recipient_id, actor_id, verb, target_ct_id=None, target_id=None):
+    return {
+        'recipient_id': recipient_id, 'actor_id': actor_id, 'verb': verb,
+        'target_ct_id': target_ct_id, 'target_id': target_id, 'timestamp': timezone.now(),
+    }
+
+
+def notify_many(items):
+    items = list(items)
+    if not items:
+        return
+    if getattr(settings, 'NOTIFICATIONS_ASYNC', True):
+        # A cheap append now; queued for the workers once the transaction commits
+        pks = record(items)
+        transaction.on_commit(lambda: pipeline.submit(pks))
+    else:
+        deliver(items)
+
+
+def notify(recipient, actor, verb, target=None):
+    target_ct_id = ContentType.objects.get_for_model(target).pk if target is not None else None
+    notify_many([make_item(recipient.pk, actor.pk, verb, target_ct_id, getattr(target, 'pk', None))])
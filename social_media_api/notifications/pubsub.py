@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    # One connected client. Messages are wake-up hints: the stream re-reads
+    # the database from its cursor, so dropping extras on overflow is safe.
+    def __init__(self, user_id, loop, maxsize=100):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    async def wait(self, timeout):
+        # True if something arrived within timeout; drains queued hints
+        try:
+            await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        return True
+
+
+class LocalPubSub:
+    # In-process pub/sub keyed by recipient id. A broker-backed class with the
+    # same subscribe/unsubscribe/publish methods can replace it through the
+    # NOTIFICATION_PUBSUB setting.
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id, message):
+        # Safe to call from worker threads; hands off to each subscriber's loop
+        with self._lock:
+            subscribers = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.offer, message)
+
+
+pubsub = import_string(getattr(settings, 'NOTIFICATION_PUBSUB', 'notifications.pubsub.LocalPubSub'))()
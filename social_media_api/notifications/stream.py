@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from accounts.authentication import CachedTokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+
+from .models import Notification
+from .pubsub import pubsub
+from .views import NotificationCursorPagination, NotificationSerializer
+
+HEARTBEAT = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+LONG_POLL_TIMEOUT = getattr(settings, 'NOTIFICATION_LONG_POLL_TIMEOUT', 25)
+# Most rows sent when (re)connecting, so a stale cursor can't replay the world
+MAX_BACKLOG = 50
+
+paginator = NotificationCursorPagination()
+
+
+async def get_user(request):
+    # Plain async views bypass DRF, so accept a token header or a session
+    try:
+        result = await sync_to_async(CachedTokenAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    if result is not None:
+        return result[0]
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def fetch_after(user, position):
+    # Rows created or re-aggregated since `position`, oldest first
+    rows = Notification.objects.filter(recipient=user).select_related('actor').prefetch_related('target')
+    if position is None:
+        rows = rows.order_by('-timestamp', '-id')[:MAX_BACKLOG]
+        return list(reversed(rows))
+    timestamp, pk = position
+    newer = rows.exclude(paginator.older_than(timestamp, pk, inclusive=True))
+    return list(newer.order_by('timestamp', 'id')[:MAX_BACKLOG])
+
+
+def serialize(rows):
+    data = NotificationSerializer(rows, many=True).data
+    return [(paginator.encode_cursor(row), item) for row, item in zip(rows, data)]
+
+
+def read_position(token):
+    if not token:
+        return None
+    try:
+        return paginator.decode_token(token)
+    except NotFound:
+        return None
+
+
+async def fetch_events(user, position):
+    return await sync_to_async(lambda: serialize(fetch_after(user, position)))()
+
+
+async def notification_stream(request):
+    # Server-Sent Events; reconnecting clients resume via Last-Event-ID
+    user = await get_user(request)
+    if user is None:
+        return HttpResponse(status=401)
+    position = read_position(request.headers.get('Last-Event-ID') or request.GET.get('cursor'))
+
+    async def events():
+        # Subscribed before reading the backlog so nothing falls in between
+        subscription = pubsub.subscribe(user.pk)
+        current, woken = position, True
+        try:
+            while True:
+                if woken:
+                    for cursor, item in await fetch_events(user, current):
+                        current = paginator.decode_token(cursor)
+                        yield f"id: {cursor}\nevent: notification\ndata: {json.dumps(item, default=str)}\n\n"
+                woken = await subscription.wait(HEARTBEAT)
+                if not woken:
+                    yield ": ping\n\n"
+        finally:
+            pubsub.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def notification_poll(request):
+    # Long-poll fallback: returns as soon as something newer than ?cursor= exists
+    user = await get_user(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    token = request.GET.get('cursor')
+    position = read_position(token)
+
+    subscription = pubsub.subscribe(user.pk)
+    try:
+        events = await fetch_events(user, position)
+        if not events and await subscription.wait(LONG_POLL_TIMEOUT):
+            events = await fetch_events(user, position)
+    finally:
+        pubsub.unsubscribe(subscription)
+
+    return JsonResponse({
+        'cursor': events[-1][0] if events else token,
+        'results': [item for _, item in events],
+    })
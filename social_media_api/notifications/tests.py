@@ -0,0 +1,212 @@
+import asyncio
+import time
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from . import stream, unread
+from .aggregation import WINDOW
+from .models import Notification, NotificationOutbox
+from .pipeline import LocalBroker, NotificationPipeline, deliver, drain_outbox, make_item, notify_many, record
+from .views import NotificationCursorPagination
+
+User = get_user_model()
+
+
+class OutboxDrainTestCase(TestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username="recipient", password="password")
+        self.actors = [User.objects.create_user(username=f"actor{i}", password="password") for i in range(2)]
+
+    def items(self):
+        return [make_item(self.recipient.pk, actor.pk, f"followed you {i}") for i, actor in enumerate(self.actors)]
+
+    def test_drain_replays_and_deletes_rows(self):
+        record(self.items()[:1])
+        self.assertEqual(drain_outbox(), 1)
+        self.assertFalse(NotificationOutbox.objects.exists())
+        self.assertEqual(Notification.objects.get().recipient_id, self.recipient.pk)
+
+    def test_queued_items_survive_a_restart(self):
+        worker = NotificationPipeline(LocalBroker(), workers=0)
+        with mock.patch('notifications.pipeline.pipeline', worker), self.captureOnCommitCallbacks(execute=True):
+            notify_many(self.items())
+            # Recorded with the request, before anything is queued
+            self.assertEqual(NotificationOutbox.objects.count(), 2)
+        self.assertEqual(worker.broker.qsize(), 2)
+        # The process stops (or dies) with both still queued
+        worker.stop()
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(drain_outbox(), 2)
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_overflow_and_drained_rows_are_delivered_once(self):
+        worker = NotificationPipeline(LocalBroker(maxsize=1), workers=0)
+        worker.submit(record(self.items()))
+        self.assertEqual(worker.broker.qsize(), 1)
+        # The drain gets there first, so the queued id finds its row gone
+        self.assertEqual(drain_outbox(), 2)
+        worker.flush()
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_failed_delivery_leaves_rows_for_the_drain(self):
+        worker = NotificationPipeline(LocalBroker(), workers=0)
+        worker.submit(record(self.items()))
+        with mock.patch('notifications.pipeline.deliver', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            worker.flush()
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+        self.assertEqual(drain_outbox(), 2)
+
+    def test_worker_replays_outbox_periodically(self):
+        pipeline = NotificationPipeline(LocalBroker(), workers=1, poll_interval=0.01, drain_interval=0.05)
+        with mock.patch('notifications.pipeline.drain_outbox', side_effect=[RuntimeError] + [0] * 100) as drain, \
+                mock.patch('notifications.pipeline.connection'), self.assertLogs('notifications.pipeline', 'ERROR'):
+            pipeline.start()
+            time.sleep(0.3)
+            pipeline.stop()
+        # Not just once at startup, and a failed replay doesn't kill the worker
+        self.assertGreaterEqual(drain.call_count, 3)
+
+
+class MarkReadTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="password")
+        actors = [User.objects.create_user(username=f"actor{i}", password="password") for i in range(3)]
+        deliver([make_item(self.user.pk, actor.pk, f"followed you {i}") for i, actor in enumerate(actors)])
+        self.client.force_authenticate(self.user)
+
+    def test_mark_read_up_to_cursor(self):
+        second = Notification.objects.order_by('-timestamp', '-pk')[1]
+        cursor = NotificationCursorPagination().encode_cursor(second)
+        response = self.client.post('/api/notifications/mark-read/', {'cursor': cursor}, format='json')
+        self.assertEqual(response.data, {'marked_read': 2})
+        self.assertEqual(Notification.objects.filter(unread=True).count(), 1)
+
+    def test_bad_cursors_are_400(self):
+        for cursor in [123, ["x"], {"a": 1}, "not-a-cursor", "bm9wZQ=="]:
+            response = self.client.post('/api/notifications/mark-read/', {'cursor': cursor}, format='json')
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertIn('cursor', response.data)
+        self.assertEqual(self.client.post('/api/notifications/mark-read/', ["x"], format='json').status_code, 400)
+        self.assertEqual(Notification.objects.filter(unread=True).count(), 3)
+
+
+class AggregationTestCase(TestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username="recipient", password="password")
+        self.actors = [User.objects.create_user(username=f"actor{i}", password="password") for i in range(7)]
+
+    def like(self, actor, at=None):
+        item = make_item(self.recipient.pk, actor.pk, "liked your post", 1, 5)
+        if at is not None:
+            item['timestamp'] = at
+        return item
+
+    def test_repeat_actors_outside_the_sample_count_once(self):
+        deliver([self.like(actor) for actor in self.actors])
+        # actor0 has dropped out of the five-actor sample by now
+        deliver([self.like(self.actors[0]), self.like(self.actors[1])])
+        row = Notification.objects.get()
+        self.assertEqual(row.actor_count, 7)
+        self.assertEqual(row.sample_actor_ids[:2], [self.actors[1].pk, self.actors[0].pk])
+
+    def test_window_is_anchored_to_the_first_event(self):
+        started = timezone.now() - WINDOW - timedelta(minutes=1)
+        deliver([self.like(self.actors[0], at=started)])
+        # A steady trickle keeps bumping the row's timestamp...
+        Notification.objects.update(timestamp=timezone.now())
+        deliver([self.like(self.actors[1])])
+        # ...but the burst still closes WINDOW after it began
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+
+class UnreadCountTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="user", password="password")
+        self.actor = User.objects.create_user(username="actor", password="password")
+        self.client.force_authenticate(self.user)
+
+    def deliver(self, *verbs):
+        with self.captureOnCommitCallbacks(execute=True):
+            deliver([make_item(self.user.pk, self.actor.pk, verb) for verb in verbs])
+
+    def unread(self):
+        with self.assertNumQueries(0):
+            return self.client.get('/api/notifications/unread-count/').data['unread']
+
+    def test_counter_follows_commits_and_reads(self):
+        self.assertEqual(unread.get_count(self.user.pk), 0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            deliver([make_item(self.user.pk, self.actor.pk, "followed you")])
+            # Nothing counted until the rows commit
+            self.assertEqual(unread.get_count(self.user.pk), 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.unread(), 1)
+        # Merged into the existing unread row: no new unread notification
+        self.deliver("followed you")
+        self.deliver("mentioned you", "replied to you")
+        self.assertEqual(self.unread(), 3)
+
+        oldest = Notification.objects.order_by('timestamp', 'pk')[1]
+        cursor = NotificationCursorPagination().encode_cursor(oldest)
+        self.client.post('/api/notifications/mark-read/', {'cursor': cursor}, format='json')
+        self.assertEqual(self.unread(), 1)
+        self.client.post('/api/notifications/mark-read/')
+        self.assertEqual(self.unread(), 0)
+
+    def test_missing_counter_is_recomputed(self):
+        self.deliver("followed you")
+        cache.delete(unread.cache_key(self.user.pk))
+        self.assertEqual(unread.get_count(self.user.pk), 1)
+
+
+# The async views read through their own connections, so rows must be committed
+class StreamTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="password")
+        self.actor = User.objects.create_user(username="actor", password="password")
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+
+    async def deliver_later(self, verb, delay=0.1):
+        await asyncio.sleep(delay)
+        await sync_to_async(deliver)([make_item(self.user.pk, self.actor.pk, verb)])
+
+    async def test_poll_resumes_from_cursor(self):
+        self.assertEqual((await self.async_client.get('/api/notifications/poll/')).status_code, 401)
+        await self.deliver_later("followed you", delay=0)
+        data = (await self.async_client.get('/api/notifications/poll/', headers=self.headers)).json()
+        self.assertEqual([item['verb'] for item in data['results']], ["followed you"])
+
+        # Nothing newer yet: the poll waits for the next notification
+        later = asyncio.ensure_future(self.deliver_later("mentioned you"))
+        response = await self.async_client.get('/api/notifications/poll/', {'cursor': data['cursor']}, headers=self.headers)
+        await later
+        self.assertEqual([item['verb'] for item in response.json()['results']], ["mentioned you"])
+
+    async def test_stream_resumes_from_last_event_id(self):
+        await self.deliver_later("followed you", delay=0)
+        first = await sync_to_async(Notification.objects.get)()
+        await self.deliver_later("mentioned you", delay=0)
+        headers = {**self.headers, 'Last-Event-ID': NotificationCursorPagination().encode_cursor(first)}
+        with mock.patch.object(stream, 'HEARTBEAT', 0.1):
+            response = await self.async_client.get('/api/notifications/stream/', headers=headers)
+            events = response.streaming_content.__aiter__()
+            try:
+                # Only what came after the client's last event is replayed
+                self.assertIn(b'"verb": "mentioned you"', await events.__anext__())
+                self.assertEqual(await events.__anext__(), b': ping\n\n')
+                await self.deliver_later("replied to you", delay=0)
+                self.assertIn(b'"verb": "replied to you"', await events.__anext__())
+            finally:
+                await events.aclose()
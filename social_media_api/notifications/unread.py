@@ -0,0 +1,49 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Notification
+
+# Cached values expire so any drift (missed increments, other processes)
+# is reconciled against the database at least this often.
+TTL = getattr(settings, 'NOTIFICATION_UNREAD_CACHE_TTL', 300)
+
+
+def cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_count(user_id):
+    count = cache.get(cache_key(user_id))
+    if count is None:
+        count = reconcile(user_id)
+    return count
+
+
+def reconcile(user_id):
+    count = Notification.objects.filter(recipient_id=user_id, unread=True).count()
+    cache.set(cache_key(user_id), count, TTL)
+    return count
+
+
+def _add(user_id, delta):
+    try:
+        count = cache.incr(cache_key(user_id), delta)
+    except ValueError:
+        # Not cached: the next read recomputes from the database
+        return
+    if count < 0:
+        cache.delete(cache_key(user_id))
+
+
+def record_created(notifications):
+    for user_id, n in Counter(row.recipient_id for row in notifications).items():
+        _add(user_id, n)
+
+
+def record_read(user_id, marked, all_read=False):
+    if all_read:
+        cache.set(cache_key(user_id), 0, TTL)
+    elif marked:
+        _add(user_id, -marked)
@@ -1,3 +1,10 @@
 from django.urls import path
-from .views import NotificationListView
-urlpatterns = [path('', NotificationListView.as_view())]
+from .views import NotificationListView, MarkReadView, UnreadCountView
+from .stream import notification_stream, notification_poll
+urlpatterns = [
+    path('', NotificationListView.as_view()),
+    path('mark-read/', MarkReadView.as_view()),
+    path('unread-count/', UnreadCountView.as_view()),
+    path('stream/', notification_stream),
+    path('poll/', notification_poll),
+]
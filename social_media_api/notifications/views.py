@@ -1,14 +1,101 @@
-from rest_framework import generics, permissions, serializers
+from collections import OrderedDict
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from rest_framework import generics, permissions, serializers, status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from posts.pagination import KeysetCursorPagination
+from . import unread
 from .models import Notification
 
+User = get_user_model()
+
+class NotificationCursorPagination(KeysetCursorPagination):
+    cursor_field = 'timestamp'
+
+    def get_paginated_response(self, data):
+        # `head` marks the newest row on the page; POST it to mark-read/
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('head', self.encode_cursor(self.page[0]) if self.page else None),
+            ('results', data),
+        ]))
+
+class NotificationListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Resolve every sampled actor on the page with one query
+        rows = list(data.all() if hasattr(data, 'all') else data)
+        ids = {pk for row in rows for pk in row.sample_actor_ids}
+        self.context['actor_names'] = dict(User.objects.filter(pk__in=ids).values_list('pk', 'username'))
+        return super().to_representation(rows)
+
 class NotificationSerializer(serializers.ModelSerializer):
     actor = serializers.StringRelatedField()
+    summary = serializers.SerializerMethodField()
+    sample_actors = serializers.SerializerMethodField()
+    target = serializers.SerializerMethodField()
     class Meta:
         model = Notification
-        fields = ['id', 'actor', 'verb', 'timestamp', 'unread']
+        fields = ['id', 'actor', 'verb', 'timestamp', 'unread', 'actor_count', 'sample_actors', 'summary', 'target']
+        list_serializer_class = NotificationListSerializer
+
+    def get_summary(self, obj):
+        # e.g. "alice and 41 others liked your post"
+        if obj.actor_count > 1:
+            others = obj.actor_count - 1
+            return f"{obj.actor} and {others} other{'s' if others > 1 else ''} {obj.verb}"
+        return f"{obj.actor} {obj.verb}"
+
+    def get_sample_actors(self, obj):
+        names = self.context.get('actor_names')
+        if names is None:
+            names = dict(User.objects.filter(pk__in=obj.sample_actor_ids).values_list('pk', 'username'))
+        return [names[pk] for pk in obj.sample_actor_ids if pk in names]
+
+    def get_target(self, obj):
+        # target_ct comes from the ContentType cache; the target itself is prefetched per type
+        if obj.target_ct_id is None:
+            return None
+        target_ct = ContentType.objects.get_for_id(obj.target_ct_id)
+        return {'type': target_ct.model, 'id': obj.target_id, 'display': str(obj.target) if obj.target else None}
 
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationCursorPagination
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user)
+        # prefetch_related('target') issues one query per target content type
+        return (
+            Notification.objects.filter(recipient=self.request.user)
+            .select_related('actor')
+            .prefetch_related('target')
+        )
+
+class MarkReadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    def post(self, request):
+        # Marks everything at or older than `cursor` (all unread when omitted)
+        rows = Notification.objects.filter(recipient=request.user, unread=True)
+        if not isinstance(request.data, dict):
+            raise ValidationError('Expected an object with an optional cursor.')
+        token = request.data.get('cursor')
+        if token is not None and not isinstance(token, str):
+            raise ValidationError({'cursor': 'Expected a cursor string.'})
+        if token:
+            paginator = NotificationCursorPagination()
+            try:
+                timestamp, pk = paginator.decode_token(token)
+            except NotFound:
+                # A bad cursor in a request body is a client error, not a missing page
+                raise ValidationError({'cursor': paginator.invalid_cursor_message})
+            rows = rows.filter(paginator.older_than(timestamp, pk, inclusive=True))
+        updated = rows.update(unread=False)
+        unread.record_read(request.user.pk, updated, all_read=not token)
+        return Response({'marked_read': updated}, status=status.HTTP_200_OK)
+
+class UnreadCountView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    def get(self, request):
+        # O(1) cache read; falls back to an indexed COUNT when the key is cold
+        return Response({'unread': unread.get_count(request.user.pk)})
@@ -0,0 +1,161 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import F
+
+from notifications.pipeline import make_item, notify_many
+from . import trending
+from .models import Post, Like, remove_events
+
+logger = logging.getLogger(__name__)
+
+LIKE_VERB = "liked your post"
+
+
+def _bump_likes(post_deltas):
+    # One UPDATE per distinct delta instead of one per post
+    by_delta = defaultdict(list)
+    for post_id, delta in post_deltas.items():
+        if delta:
+            by_delta[delta].append(post_id)
+    for delta, post_ids in by_delta.items():
+        Post.objects.filter(pk__in=post_ids).update(likes_count=F('likes_count') + delta)
+        if delta > 0:
+            trending.add_event(post_ids, trending.LIKE_WEIGHT * delta)
+
+
+def bulk_like(pairs):
+    # Apply many (user_id, post_id) likes with a single INSERT.
+    # bulk_create skips signals, so counters and notifications are done here.
+    pairs = set(pairs)
+    if not pairs:
+        return set()
+    authors = dict(Post.objects.filter(pk__in={p for _, p in pairs}).values_list('id', 'author_id'))
+    pairs = {(u, p) for u, p in pairs if p in authors}
+    existing = set(
+        Like.objects.filter(user_id__in={u for u, _ in pairs}, post_id__in={p for _, p in pairs})
+        .values_list('user_id', 'post_id')
+    )
+    new = pairs - existing
+
+    with transaction.atomic():
+        likes = [Like(user_id=u, post_id=p) for u, p in new]
+        Like.objects.bulk_create(likes, ignore_conflicts=True)
+        # A like racing in since the read above wins the (post, user) constraint
+        # and ours is silently dropped, so only rows still carrying the
+        # created_at stamped on our objects were written by this call
+        stamped = {(like.user_id, like.post_id): like.created_at for like in likes}
+        inserted = {
+            (u, p)
+            for u, p, created_at in Like.objects.filter(
+                user_id__in={u for u, _ in new}, post_id__in={p for _, p in new}
+            ).values_list('user_id', 'post_id', 'created_at')
+            if stamped.get((u, p)) == created_at
+        }
+        deltas = defaultdict(int)
+        for _, post_id in inserted:
+            deltas[post_id] += 1
+        _bump_likes(deltas)
+
+        post_ct = ContentType.objects.get_for_model(Post)
+        notify_many(
+            make_item(authors[p], u, LIKE_VERB, post_ct.pk, p)
+            for u, p in inserted if authors[p] != u
+        )
+    return inserted
+
+
+def bulk_unlike(pairs):
+    # Remove many (user_id, post_id) likes with a single DELETE; a queryset
+    # delete skips Like.delete, so the counters are settled here
+    pairs = set(pairs)
+    if not pairs:
+        return set()
+    likes = Like.objects.filter(user_id__in={u for u, _ in pairs}, post_id__in={p for _, p in pairs})
+    with transaction.atomic():
+        # Locked, so a racing unlike can't make us settle a row twice
+        matched = {
+            (u, p): (pk, created_at)
+            for pk, u, p, created_at in likes.select_for_update().values_list('pk', 'user_id', 'post_id', 'created_at')
+            if (u, p) in pairs
+        }
+        Like.objects.filter(pk__in=[pk for pk, _ in matched.values()]).delete()
+        remove_events('likes_count', [(p, created_at) for (_, p), (_, created_at) in matched.items()])
+    return set(matched)
+
+
+class LikeBuffer:
+    # Absorbs like storms: per (user, post) only the last like/unlike in a
+    # flush interval survives, and each flush is one bulk_like + bulk_unlike.
+    def __init__(self, interval=1.0, max_pending=5000):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, user_id, post_id, liked=True):
+        with self._lock:
+            self._pending[(user_id, post_id)] = liked
+            full = len(self._pending) >= self.max_pending
+            if not full:
+                self._schedule()
+        if full:
+            self.flush()
+
+    def _schedule(self):
+        # Called with the lock held
+        if self._timer is None:
+            self._timer = threading.Timer(self.interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        try:
+            bulk_like(pair for pair, liked in pending.items() if liked)
+            bulk_unlike(pair for pair, liked in pending.items() if not liked)
+        except Exception:
+            # Both are idempotent, so the whole batch goes back for the next
+            # flush; anything added since is newer and wins
+            with self._lock:
+                for pair, liked in pending.items():
+                    self._pending.setdefault(pair, liked)
+                self._schedule()
+            raise
+        return len(pending)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Flushing buffered likes failed; retrying in %ss', self.interval)
+        finally:
+            connection.close()
+
+    def stop(self):
+        # At process exit, write out whatever the last interval buffered
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Flushing buffered likes at exit failed; %d dropped', len(self._pending))
+
+
+like_buffer = LikeBuffer(
+    interval=getattr(settings, 'LIKE_BUFFER_FLUSH_INTERVAL', 1.0),
+    max_pending=getattr(settings, 'LIKE_BUFFER_MAX_PENDING', 5000),
+)
+atexit.register(like_buffer.stop)
+
+
+def buffering_enabled():
+    return getattr(settings, 'LIKE_BUFFER_ENABLED', False)
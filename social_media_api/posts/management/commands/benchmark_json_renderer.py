@@ -0,0 +1,56 @@
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from posts.models import Post, Comment
+from posts.serializers import PostSerializer
+from social_media_api.renderers import FastJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = 'Compare FastJSONRenderer with DRF JSONRenderer on PostSerializer output (no database needed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100)
+        parser.add_argument('--comments', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        data = PostSerializer(self.sample_posts(options['posts'], options['comments']), many=True).data
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+        if stock.render(data) != fast.render(data):
+            self.stderr.write(self.style.WARNING('Renderers disagree on output'))
+
+        results = {}
+        for name, renderer in (('JSONRenderer', stock), ('FastJSONRenderer', fast)):
+            seconds = min(timeit.repeat(lambda: renderer.render(data), number=options['repeat'], repeat=5))
+            results[name] = seconds / options['repeat'] * 1000
+            self.stdout.write(f'{name:<18} {results[name]:8.3f} ms/render')
+
+        backend = 'orjson' if orjson is not None else 'json fallback'
+        speedup = results['JSONRenderer'] / results['FastJSONRenderer']
+        self.stdout.write(self.style.SUCCESS(
+            f'{options["posts"]} posts x {options["comments"]} comments: {speedup:.1f}x faster ({backend})'
+        ))
+
+    def sample_posts(self, count, comments_per_post):
+        # Unsaved instances shaped like a feed page, so the benchmark only measures rendering
+        User = get_user_model()
+        now = timezone.now()
+        author = User(pk=1, username='author')
+        posts = []
+        for i in range(count):
+            post = Post(
+                pk=i + 1, author=author, title=f'Post {i} — “quoted” ü', content='Lorem ipsum dolor sit amet. ' * 20,
+                created_at=now, updated_at=now, likes_count=i, comments_count=comments_per_post,
+            )
+            post.loaded_comments = [
+                Comment(pk=i * comments_per_post + j + 1, post=post, author=author, path=f'{i:010d}/',
+                        content='Nice post!', created_at=now, updated_at=now)
+                for j in range(comments_per_post)
+            ]
+            posts.append(post)
+        return posts
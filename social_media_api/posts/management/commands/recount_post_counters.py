@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from posts.models import Post, Like, Comment
+
+
+class Command(BaseCommand):
+    help = 'Recompute drifted Post.likes_count / Post.comments_count in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        fixed = 0
+        while True:
+            # Lock the batch before counting, so a concurrent F() increment
+            # either lands in the count or waits and applies on top of it
+            with transaction.atomic():
+                posts = list(
+                    Post.objects.select_for_update().filter(pk__gt=last_pk).order_by('pk')
+                    .only('pk', 'likes_count', 'comments_count')[:batch_size]
+                )
+                if not posts:
+                    break
+                last_pk = posts[-1].pk
+                ids = [post.pk for post in posts]
+                likes = dict(Like.objects.filter(post_id__in=ids).values('post_id').annotate(n=Count('pk')).values_list('post_id', 'n'))
+                comments = dict(Comment.objects.filter(post_id__in=ids).values('post_id').annotate(n=Count('pk')).values_list('post_id', 'n'))
+
+                drifted = []
+                for post in posts:
+                    actual = (likes.get(post.pk, 0), comments.get(post.pk, 0))
+                    if (post.likes_count, post.comments_count) != actual:
+                        post.likes_count, post.comments_count = actual
+                        drifted.append(post)
+                Post.objects.bulk_update(drifted, ['likes_count', 'comments_count'])
+                fixed += len(drifted)
+
+        self.stdout.write(self.style.SUCCESS(f'Recounted counters, fixed {fixed} posts.'))
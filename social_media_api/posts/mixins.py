@@ -0,0 +1,88 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+
+
+def query_list(request, name):
+    # ?name=a,b,c -> {'a', 'b', 'c'}; None when the parameter is absent
+    if request is None or name not in request.query_params:
+        return None
+    return {part.strip() for part in request.query_params[name].split(',') if part.strip()}
+
+
+def select_related_paths(tree, prefix=''):
+    # Flattens query.select_related ({'a': {'b': {}}}) back into 'a__b' lookups
+    for name, children in tree.items():
+        path = prefix + name
+        if children:
+            yield from select_related_paths(children, path + '__')
+        else:
+            yield path
+
+
+class SparseFieldsMixin:
+    # ?fields=a,b limits a read to those fields and ?expand=rel adds back any
+    # of Meta.expandable_fields (nested relations). Without ?fields the full
+    # representation is returned. Writes always use every field.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.selected_fields(self.context.get('request'))
+        if selected is not None:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, request):
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        fields = query_list(request, 'fields')
+        if fields is None:
+            return None
+        expandable = set(getattr(cls.Meta, 'expandable_fields', ()))
+        return fields | ((query_list(request, 'expand') or set()) & expandable)
+
+    @classmethod
+    def prune_queryset(cls, queryset, request, keep=()):
+        # Drops select_related/prefetch_related lookups for relations that are
+        # not selected and defers columns no selected field reads. `keep` names
+        # columns the view itself needs (ordering, pagination cursors).
+        selected = cls.selected_fields(request)
+        if selected is None:
+            return queryset
+        opts = queryset.model._meta
+        expandable = set(getattr(cls.Meta, 'expandable_fields', ()))
+        fields = cls().fields
+        roots, columns, deferrable = set(keep), {opts.pk.name, *keep}, True
+        for name in selected & set(fields):
+            if name in expandable:
+                # Nested relations are loaded by their own prefetch, not by columns here
+                roots.add(name)
+                continue
+            field = fields[name]
+            source = field.source.split('.')[0]
+            try:
+                model_field = opts.get_field(source)
+            except FieldDoesNotExist:
+                # Method fields and properties may read any attribute
+                deferrable = False
+                continue
+            roots.add(model_field.name)
+            if model_field.concrete:
+                columns.add(model_field.name)
+
+        lookups = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if getattr(lookup, 'prefetch_through', lookup).split('__')[0] in roots
+        ]
+        queryset = queryset.prefetch_related(None).prefetch_related(*lookups)
+        if isinstance(queryset.query.select_related, dict):
+            kept = [
+                path for path in select_related_paths(queryset.query.select_related)
+                if path.split('__')[0] in roots
+            ]
+            queryset = queryset.select_related(None)
+            if kept:
+                queryset = queryset.select_related(*kept)
+        if deferrable:
+            queryset = queryset.only(*columns)
+        return queryset
@@ -1,6 +1,12 @@
-from django.db import models
+from collections import defaultdict
+
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
+from django.db.models import F, Q
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
 
 class Post(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts')
@@ -8,13 +14,79 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized counters, maintained by the Like/Comment signals below
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    # Log-domain time-decayed engagement score, see posts.trending
+    hot_score = models.FloatField(default=0.0)
+    # Set when posts.timeline skipped the fan-out (author above the follower
+    # limit at post time); feeds merge such posts at read time
+    fan_out_skipped = models.BooleanField(default=False)
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_recent_idx'),
+            models.Index(fields=['-hot_score'], name='post_hot_idx'),
+            models.Index(fields=['author', '-created_at'], condition=Q(fan_out_skipped=True), name='post_fan_out_skipped_idx'),
+        ]
+
+    # Only ever moved by F() updates; a save must not write back stale copies
+    COUNTER_FIELDS = ('likes_count', 'comments_count', 'hot_score')
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # A fresh post starts with one unit of weight at its creation time
+            from .trending import contribution, POST_WEIGHT
+            self.hot_score = contribution(POST_WEIGHT, self.created_at)
+        elif kwargs.get('update_fields') is None:
+            skip = {*self.COUNTER_FIELDS, *self.get_deferred_fields()}
+            kwargs['update_fields'] = [
+                f.attname for f in self._meta.concrete_fields
+                if not f.primary_key and f.attname not in skip
+            ]
+        super().save(*args, **kwargs)
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='comments')
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
+    # Materialized path of zero-padded ids from the thread root, e.g.
+    # "0000000012/0000000045/". Sorting a post's comments by path yields
+    # each thread depth-first, so a page of threads is one range scan.
+    path = models.CharField(max_length=255, default='', editable=False)
     content = models.TextField()
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='comment_recent_idx'),
+            models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+            models.Index(fields=['post', '-created_at', '-id'], name='comment_post_recent_idx'),
+        ]
+
+    @property
+    def depth(self):
+        return max(self.path.count('/') - 1, 0)
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        # The row commits together with its counter bump (post_save), which
+        # recount_post_counters relies on when it counts under lock
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                # The path needs our own id, so it is written right after the insert
+                prefix = self.parent.path if self.parent_id else ''
+                self.path = f'{prefix}{self.pk:010d}/'
+                Comment.objects.filter(pk=self.pk).update(path=self.path)
+
+    def delete(self, *args, **kwargs):
+        # Replies cascade with it, so the whole thread below is uncounted
+        with transaction.atomic():
+            removed = thread_events([self])
+            result = super().delete(*args, **kwargs)
+            if result[0]:
+                remove_events('comments_count', removed)
+        return result
 
 class Like(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
@@ -22,3 +94,105 @@ class Like(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     class Meta:
         unique_together = ('post', 'user')
+
+    def save(self, *args, **kwargs):
+        # Insert and counter bump commit together (see Comment.save)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            # Nothing to settle if a concurrent unlike got there first
+            if result[0]:
+                remove_events('likes_count', [(self.post_id, self.created_at)])
+        return result
+
+# Precomputed home timeline: one row per (follower, post) written at post time
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    created_at = models.DateTimeField()
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_recent_idx')]
+
+
+# Keep timelines in step with follows/unfollows
+@receiver(m2m_changed, sender=get_user_model().followers.through)
+def sync_timeline_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    from . import timeline
+    if action == 'post_add':
+        # forward: instance gained followers pk_set; reverse: instance now follows pk_set
+        if reverse:
+            timeline.backfill(instance.pk, pk_set)
+        else:
+            for pk in pk_set:
+                timeline.backfill(pk, [instance.pk])
+    elif action == 'post_remove':
+        if reverse:
+            timeline.prune(instance.pk, pk_set)
+        else:
+            for pk in pk_set:
+                timeline.prune(pk, [instance.pk])
+    elif action == 'pre_clear':
+        if reverse:
+            timeline.prune(instance.pk)
+        else:
+            TimelineEntry.objects.filter(post__author=instance).delete()
+
+
+# Keep Post.likes_count / Post.comments_count (and hot_score) in step with F() updates.
+# Deletes are settled by the code that deletes (Like/Comment.delete, bulk_unlike,
+# user deletion below) rather than post_delete receivers: a receiver would stop
+# Django from fast-deleting a post's or user's likes in one statement.
+def bump_counter(post_id, field, delta):
+    Post.objects.filter(pk=post_id).update(**{field: F(field) + delta})
+
+def remove_events(field, rows):
+    # Undo deleted likes/comments given their (post_id, created_at): one
+    # counter and one hot_score UPDATE per affected post
+    from . import trending
+    weight = trending.LIKE_WEIGHT if field == 'likes_count' else trending.COMMENT_WEIGHT
+    by_post = defaultdict(list)
+    for post_id, created_at in rows:
+        by_post[post_id].append(created_at)
+    for post_id, times in by_post.items():
+        bump_counter(post_id, field, -len(times))
+        trending.remove_events(post_id, weight, times)
+
+def thread_events(comments, chunk_size=500):
+    # (post_id, created_at) of the given comments and every reply below them
+    comments = list(comments)
+    rows = {}
+    for i in range(0, len(comments), chunk_size):
+        threads = Q()
+        for comment in comments[i:i + chunk_size]:
+            threads |= Q(post_id=comment.post_id, path__startswith=comment.path) if comment.path else Q(pk=comment.pk)
+        # Keyed by pk: a thread can sit inside another one from an earlier chunk
+        rows.update((pk, (post_id, at)) for pk, post_id, at in Comment.objects.filter(threads).values_list('pk', 'post_id', 'created_at'))
+    return list(rows.values())
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    from . import trending
+    if created:
+        bump_counter(instance.post_id, 'likes_count', 1)
+        trending.add_event([instance.post_id], trending.LIKE_WEIGHT, instance.created_at)
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    from . import trending
+    if created:
+        bump_counter(instance.post_id, 'comments_count', 1)
+        trending.add_event([instance.post_id], trending.COMMENT_WEIGHT, instance.created_at)
+
+@receiver(pre_delete, sender=get_user_model())
+def user_deleted(sender, instance, **kwargs):
+    # The user's likes and comment threads cascade away in bulk; settle the
+    # counters of other people's posts (their own posts are going anyway)
+    elsewhere = ~Q(post__author=instance)
+    likes = Like.objects.filter(elsewhere, user=instance).values_list('post_id', 'created_at')
+    remove_events('likes_count', likes)
+    comments = Comment.objects.filter(elsewhere, author=instance).only('pk', 'post_id', 'path')
+    remove_events('comments_count', thread_events(comments))
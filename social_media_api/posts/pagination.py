@@ -0,0 +1,150 @@
+import base64
+import re
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    # Keyset ("seek") pagination over (cursor_field, id), newest first.
+    # The cursor is an opaque token of the last row's position, so every
+    # page is one indexed range scan no matter how deep the client goes.
+    cursor_field = 'created_at'
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            value, pk = position
+            queryset = queryset.filter(self.older_than(value, pk))
+        queryset = queryset.order_by(f'-{self.cursor_field}', '-pk')
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def paginate_keys(self, fetch, load, request):
+        # For pages merged from several sources: fetch(position, limit) returns
+        # (cursor value, pk) pairs in page order, load(pks) the rows to show
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        keys = fetch(self.decode_cursor(request), self.page_size + 1)
+        self.has_next = len(keys) > self.page_size
+        pks = [pk for _, pk in keys[:self.page_size]]
+        rows = {row.pk: row for row in load(pks)}
+        self.page = [rows[pk] for pk in pks if pk in rows]
+        return self.page
+
+    def older_than(self, value, pk, inclusive=False):
+        # Rows strictly after (value, pk) in newest-first order, or at it when inclusive
+        return (
+            Q(**{f'{self.cursor_field}__lt': value}) |
+            Q(**{self.cursor_field: value, 'pk__lte' if inclusive else 'pk__lt': pk})
+        )
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        return self.decode_token(token)
+
+    def decode_token(self, token):
+        try:
+            raw = base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii')
+            value, pk = raw.rsplit('|', 1)
+            return datetime.fromisoformat(value), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj):
+        raw = f'{getattr(obj, self.cursor_field).isoformat()}|{obj.pk}'
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ThreadPagination(KeysetCursorPagination):
+    # Pages over one post's top-level comments in thread order. A page is its
+    # roots plus every reply under them: a single range over (post, path),
+    # bounded by the first root on this page and the first root on the next.
+    page_size = 10
+    path_pattern = re.compile(r'^(\d{10}/)+$')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        roots = queryset.filter(parent__isnull=True)
+        after = self.decode_cursor(request)
+        if after is not None:
+            roots = roots.filter(path__gt=after)
+        bounds = list(roots.order_by('path').values_list('path', flat=True)[:self.page_size + 1])
+
+        self.has_next = len(bounds) > self.page_size
+        if not bounds:
+            self.page, self.last_root = [], None
+            return self.page
+        rows = queryset.filter(path__gte=bounds[0])
+        if self.has_next:
+            rows = rows.filter(path__lt=bounds[-1])
+        self.last_root = bounds[min(self.page_size, len(bounds)) - 1]
+        self.page = list(rows.order_by('path'))
+        return self.page
+
+    def decode_token(self, token):
+        try:
+            path = base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii')
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not self.path_pattern.match(path):
+            raise NotFound(self.invalid_cursor_message)
+        return path
+
+    def get_next_cursor(self):
+        if not self.has_next or self.last_root is None:
+            return None
+        return base64.urlsafe_b64encode(self.last_root.encode('ascii')).decode('ascii')
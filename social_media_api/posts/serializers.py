@@ -1,16 +1,56 @@
+from django.conf import settings
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Post, Comment, Like
+from .mixins import SparseFieldsMixin
+from .models import Post, Comment
 
-class CommentSerializer(serializers.ModelSerializer):
+# Replies nested deeper than this are rejected (path is 11 chars per level)
+COMMENT_MAX_DEPTH = getattr(settings, 'COMMENT_MAX_DEPTH', 20)
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.StringRelatedField(read_only=True)
+    depth = serializers.IntegerField(read_only=True)
     class Meta:
         model = Comment
-        fields = ['id', 'post', 'author', 'content', 'created_at', 'updated_at']
+        fields = ['id', 'post', 'parent', 'depth', 'author', 'content', 'created_at', 'updated_at']
+
+    def validate(self, attrs):
+        parent = attrs.get('parent')
+        if parent is not None:
+            post = attrs.get('post', getattr(self.instance, 'post', None))
+            if parent.post_id != getattr(post, 'pk', None):
+                raise serializers.ValidationError({'parent': 'Reply must belong to the same post.'})
+            if parent.depth + 1 >= COMMENT_MAX_DEPTH:
+                raise serializers.ValidationError({'parent': 'Reply thread is nested too deeply.'})
+        if self.instance is not None and 'parent' in attrs and attrs['parent'] != self.instance.parent:
+            raise serializers.ValidationError({'parent': 'A comment cannot be moved to another thread.'})
+        return attrs
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.StringRelatedField(read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
-    likes_count = serializers.IntegerField(source='likes.count', read_only=True)
+    comments = serializers.SerializerMethodField()
     class Meta:
         model = Post
-        fields = ['id', 'author', 'title', 'content', 'created_at', 'updated_at', 'comments', 'likes_count']
+        fields = ['id', 'author', 'title', 'content', 'created_at', 'updated_at', 'comments', 'comments_count', 'likes_count']
+        read_only_fields = ['comments_count', 'likes_count']
+        expandable_fields = ['comments']
+
+    @staticmethod
+    def setup_eager_loading(queryset, comments_limit=None):
+        # Loads everything the serializer touches in a fixed number of queries:
+        # posts + authors in one (counts are columns), comments + their authors in another.
+        comments = Comment.objects.select_related('author').order_by('-created_at', '-id')
+        if comments_limit is not None:
+            comments = comments[:comments_limit]
+        return queryset.select_related('author').prefetch_related(
+            Prefetch('comments', queryset=comments, to_attr='loaded_comments')
+        )
+
+    def get_comments(self, obj):
+        comments = getattr(obj, 'loaded_comments', None)
+        if comments is None:
+            comments = obj.comments.select_related('author').order_by('-created_at', '-id')
+        return CommentSerializer(comments, many=True, context=self.context).data
+
+class BulkPostIdsSerializer(serializers.Serializer):
+    post_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=100)
@@ -0,0 +1,381 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from notifications.models import Notification
+from . import timeline, trending
+from .likes import LikeBuffer, bulk_like
+from .models import Post, Comment, Like, TimelineEntry
+
+User = get_user_model()
+
+class PostQueryCountTestCase(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="password")
+        self.reader = User.objects.create_user(username="reader", password="password")
+        for i in range(30):
+            post = Post.objects.create(author=self.author, title=f"Post {i}", content="Body")
+            Comment.objects.create(post=post, author=self.reader, content="First")
+            Comment.objects.create(post=post, author=self.author, content="Second")
+            Like.objects.create(post=post, user=self.reader)
+        self.list_url = reverse('post-list')
+
+    def test_list_query_count_is_constant(self):
+        # posts + authors (counts are columns) in one query, comments + authors in another
+        for page_size in (5, 30):
+            with self.assertNumQueries(2):
+                response = self.client.get(self.list_url, {'page_size': page_size})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_sparse_fields_skip_comment_prefetch(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url, {'fields': 'id,title,likes_count'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'likes_count'})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.list_url, {'fields': 'id,title'})
+        self.assertNotIn('"content"', queries[0]['sql'])
+        self.assertNotIn('accounts_customuser', queries[0]['sql'])
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_url, {'fields': 'id', 'expand': 'comments'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'comments'})
+
+    def test_post_comments_endpoint(self):
+        post = Post.objects.get(title="Post 0")
+        url = reverse('post-comments', args=[post.pk])
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'page_size': 1})
+        self.assertEqual([c['content'] for c in response.data['results']], ["Second"])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([c['content'] for c in response.data['results']], ["First"])
+        self.assertEqual(self.client.get(url, {'count_only': 1}).data, {'count': 2})
+
+    def test_counts_and_nested_comments(self):
+        response = self.client.get(self.list_url, {'comments_limit': 1})
+        post = response.data['results'][0]
+        self.assertEqual(post['author'], "author")
+        self.assertEqual(post['likes_count'], 1)
+        self.assertEqual(post['comments_count'], 2)
+        self.assertEqual([c['content'] for c in post['comments']], ["Second"])
+
+
+class PostCounterTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="password")
+        self.post = Post.objects.create(author=self.user, title="Post", content="Body")
+
+    def test_counters_follow_likes_and_comments(self):
+        like = Like.objects.create(post=self.post, user=self.user)
+        comment = Comment.objects.create(post=self.post, author=self.user, content="Hi")
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 1))
+        like.delete()
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (0, 0))
+
+    def test_recount_command_fixes_drift(self):
+        Like.objects.create(post=self.post, user=self.user)
+        Post.objects.filter(pk=self.post.pk).update(likes_count=42, comments_count=7)
+        call_command('recount_post_counters', batch_size=1, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 0))
+
+    def test_recount_locks_the_batch_before_counting(self):
+        Like.objects.create(post=self.post, user=self.user)
+        with mock.patch('django.db.models.QuerySet.select_for_update', autospec=True,
+                        side_effect=lambda qs, *args, **kwargs: qs) as lock:
+            call_command('recount_post_counters', stdout=StringIO())
+        self.assertTrue(lock.called)
+
+    def test_like_row_and_counter_bump_commit_together(self):
+        with mock.patch('posts.models.bump_counter', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            Like.objects.create(post=self.post, user=self.user)
+        self.assertFalse(Like.objects.exists())
+
+    def test_edit_keeps_concurrent_counter_updates(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        Like.objects.create(post=self.post, user=self.user)
+        self.client.force_authenticate(self.user)
+        response = self.client.patch(reverse('post-detail', args=[self.post.pk]), {'title': "Edited"}, format='json')
+        self.assertEqual((response.status_code, response.data['likes_count']), (status.HTTP_200_OK, 1))
+        # A full save of an instance loaded before the like leaves the counters alone
+        stale.content = "Stale copy"
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.content, self.post.likes_count), ("Stale copy", 1))
+        self.assertGreater(self.post.hot_score, stale.hot_score)
+
+    def test_deleting_a_reply_thread(self):
+        root = Comment.objects.create(post=self.post, author=self.user, content="Root")
+        reply = Comment.objects.create(post=self.post, author=self.user, parent=root, content="Reply")
+        Comment.objects.create(post=self.post, author=self.user, parent=reply, content="Nested")
+        Comment.objects.create(post=self.post, author=self.user, content="Other")
+        root.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_cascades_skip_per_row_work(self):
+        fans = [User.objects.create_user(username=f"fan{i}", password="password") for i in range(10)]
+
+        def delete_post_with_likes(count):
+            post = Post.objects.create(author=self.user, title="Popular", content="Body")
+            for fan in fans[:count]:
+                Like.objects.create(post=post, user=fan)
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            return len(queries)
+
+        # The likes go in one DELETE, however many there are
+        self.assertEqual(delete_post_with_likes(2), delete_post_with_likes(10))
+
+    def test_user_deletion_settles_other_posts(self):
+        other = User.objects.create_user(username="other", password="password")
+        own_post = Post.objects.create(author=other, title="Own", content="Body")
+        Like.objects.create(post=self.post, user=other)
+        Like.objects.create(post=self.post, user=self.user)
+        thread = Comment.objects.create(post=self.post, author=other, content="Hi")
+        Comment.objects.create(post=self.post, author=self.user, parent=thread, content="Reply")
+        Comment.objects.create(post=self.post, author=self.user, content="Stays")
+        Like.objects.create(post=own_post, user=self.user)
+        other.delete()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 1))
+        self.assertEqual(self.post.comments.count(), 1)
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False)
+class BulkLikeTestCase(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="password")
+        self.fan = User.objects.create_user(username="fan", password="password")
+        self.posts = [Post.objects.create(author=self.author, title=f"Post {i}", content="Body") for i in range(3)]
+
+    def test_racing_likes_are_not_counted_twice(self):
+        racer = self.posts[0]
+        real_bulk_create = Like.objects.bulk_create
+
+        def bulk_create_after_race(objs, **kwargs):
+            # Another request likes the same post between our read and our INSERT
+            Like.objects.create(post=racer, user=self.fan)
+            return real_bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Like.objects, 'bulk_create', bulk_create_after_race):
+            inserted = bulk_like({(self.fan.pk, post.pk) for post in self.posts})
+        self.assertEqual(inserted, {(self.fan.pk, post.pk) for post in self.posts[1:]})
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('likes_count', flat=True)), [1, 1, 1])
+        self.assertEqual(
+            set(Notification.objects.values_list('target_id', flat=True)),
+            {post.pk for post in self.posts[1:]},
+        )
+
+
+class LikeBufferTestCase(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="password")
+        self.fans = [User.objects.create_user(username=f"fan{i}", password="password") for i in range(3)]
+        self.post = Post.objects.create(author=self.author, title="Post", content="Body")
+
+    def likes(self):
+        self.post.refresh_from_db()
+        return self.post.likes_count, set(Like.objects.values_list('user_id', flat=True))
+
+    def test_last_action_per_pair_wins(self):
+        buffer = LikeBuffer(interval=60)
+        buffer.add(self.fans[0].pk, self.post.pk)
+        buffer.add(self.fans[0].pk, self.post.pk)
+        buffer.add(self.fans[1].pk, self.post.pk)
+        buffer.add(self.fans[1].pk, self.post.pk, liked=False)
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(self.likes(), (1, {self.fans[0].pk}))
+
+    def test_max_pending_flushes_inline(self):
+        buffer = LikeBuffer(interval=60, max_pending=2)
+        buffer.add(self.fans[0].pk, self.post.pk)
+        self.assertEqual(self.likes(), (0, set()))
+        buffer.add(self.fans[1].pk, self.post.pk)
+        self.assertEqual(self.likes(), (2, {self.fans[0].pk, self.fans[1].pk}))
+        self.assertIsNone(buffer._timer)
+
+    def test_timer_flushes_after_the_interval(self):
+        buffer = LikeBuffer(interval=0.01)
+        flushed = threading.Event()
+        with mock.patch('posts.likes.bulk_like', side_effect=lambda pairs: flushed.set()) as like, \
+                mock.patch('posts.likes.bulk_unlike'), mock.patch('posts.likes.connection'):
+            buffer.add(self.fans[0].pk, self.post.pk)
+            self.assertTrue(flushed.wait(5))
+        self.assertEqual(list(like.call_args.args[0]), [(self.fans[0].pk, self.post.pk)])
+
+    def test_failed_flush_requeues(self):
+        buffer = LikeBuffer(interval=60)
+        buffer.add(self.fans[0].pk, self.post.pk)
+        buffer.add(self.fans[1].pk, self.post.pk)
+        with mock.patch('posts.likes.bulk_unlike', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            buffer.flush()
+        # A newer unlike made meanwhile wins over the re-queued like
+        buffer.add(self.fans[1].pk, self.post.pk, liked=False)
+        self.assertIsNotNone(buffer._timer)
+        buffer.flush()
+        self.assertEqual(self.likes(), (1, {self.fans[0].pk}))
+
+    def test_stop_flushes_and_logs_failures(self):
+        buffer = LikeBuffer(interval=60)
+        buffer.add(self.fans[0].pk, self.post.pk)
+        buffer.stop()
+        self.assertEqual(self.likes(), (1, {self.fans[0].pk}))
+        buffer.add(self.fans[1].pk, self.post.pk)
+        with mock.patch('posts.likes.bulk_like', side_effect=RuntimeError), self.assertLogs('posts.likes', 'ERROR'):
+            buffer.stop()
+        buffer._timer.cancel()
+
+
+class TrendingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", password="password")
+        self.fans = [User.objects.create_user(username=f"fan{i}", password="password") for i in range(3)]
+        created_at = timezone.now() - timedelta(days=1)
+        self.posts = [
+            Post.objects.create(author=self.author, title=f"Post {i}", content="Body", created_at=created_at)
+            for i in range(3)
+        ]
+
+    def score(self, post):
+        return Post.objects.values_list('hot_score', flat=True).get(pk=post.pk)
+
+    def hot_titles(self, **params):
+        cache.clear()
+        return [post['title'] for post in self.client.get('/api/posts/hot/', params).data]
+
+    def test_more_likes_rank_higher(self):
+        for fan in self.fans:
+            Like.objects.create(post=self.posts[1], user=fan)
+        Like.objects.create(post=self.posts[2], user=self.fans[0])
+        self.assertEqual(self.hot_titles(), ["Post 1", "Post 2", "Post 0"])
+
+    def test_newer_events_outweigh_older_ones(self):
+        now = timezone.now()
+        trending.add_event([self.posts[0].pk], 1.0, now - timedelta(hours=30))
+        trending.add_event([self.posts[1].pk], 1.0, now)
+        self.assertEqual(self.hot_titles()[:2], ["Post 1", "Post 0"])
+        # One half-life older counts for half: two such events match one new one
+        half_life = timedelta(hours=12)
+        trending.add_event([self.posts[2].pk], 1.0, now - half_life)
+        trending.add_event([self.posts[2].pk], 1.0, now - half_life)
+        self.assertAlmostEqual(self.score(self.posts[2]), self.score(self.posts[1]), places=6)
+
+    def test_unlike_lowers_the_score(self):
+        before = self.score(self.posts[0])
+        like = Like.objects.create(post=self.posts[0], user=self.fans[0])
+        self.assertGreater(self.score(self.posts[0]), before)
+        like.delete()
+        self.assertAlmostEqual(self.score(self.posts[0]), before, places=6)
+        # Removing more than was ever added clamps instead of going NaN
+        trending.remove_events(self.posts[0].pk, 10.0, [timezone.now()])
+        self.assertLess(self.score(self.posts[0]), before)
+        self.assertEqual(self.hot_titles()[-1], "Post 0")
+
+    def test_limit_is_bounded(self):
+        self.assertEqual(len(self.hot_titles(limit=0)), 1)
+        self.assertEqual(len(self.hot_titles(limit="many")), 3)
+        with mock.patch.object(trending, 'MAX_K', 2):
+            self.assertEqual(len(self.hot_titles(limit=50)), 2)
+
+
+class ThreadedCommentTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="password")
+        self.post = Post.objects.create(author=self.user, title="Post", content="Body")
+        self.url = reverse('post-thread', args=[self.post.pk])
+
+    def comment(self, content, parent=None):
+        return Comment.objects.create(post=self.post, author=self.user, content=content, parent=parent)
+
+    def test_thread_is_nested_and_paginated_by_root(self):
+        first = self.comment("first")
+        reply = self.comment("reply", parent=first)
+        second = self.comment("second")
+        self.comment("nested", parent=reply)
+        self.comment("late reply", parent=first)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'page_size': 1})
+        root = response.data['results'][0]
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual([r['content'] for r in root['replies']], ["reply", "late reply"])
+        self.assertEqual(root['replies'][0]['replies'][0]['depth'], 2)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([r['id'] for r in response.data['results']], [second.pk])
+        self.assertIsNone(response.data['next'])
+
+    def test_reply_must_match_post(self):
+        other = Post.objects.create(author=self.user, title="Other", content="Body")
+        parent = self.comment("first")
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('comment-list'), {'post': other.pk, 'parent': parent.pk, 'content': "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TimelineThresholdTestCase(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="password")
+        self.reader = User.objects.create_user(username="reader", password="password")
+        self.author.followers.add(self.reader)
+
+    def post(self, title, limit):
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWER_LIMIT', limit):
+            post = Post.objects.create(author=self.author, title=title, content="Body")
+            timeline.fan_out_post(post)
+        return post
+
+    def feed_titles(self):
+        self.client.force_authenticate(self.reader)
+        return [post['title'] for post in self.client.get('/api/feed/').data['results']]
+
+    def test_posts_survive_crossing_the_limit(self):
+        self.post("Before", limit=10)
+        # Above the limit: read-time merge only
+        self.post("Famous", limit=0)
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader).count(), 1)
+        # Back below it: the famous-era post is still in the feed
+        self.post("After", limit=10)
+        self.assertEqual(self.feed_titles(), ["After", "Famous", "Before"])
+
+        # Unfollow drops everything, a new follow brings it all back
+        self.reader.following.remove(self.author)
+        self.assertEqual(self.feed_titles(), [])
+        self.reader.following.add(self.author)
+        self.assertEqual(self.feed_titles(), ["After", "Famous", "Before"])
+
+
+    def test_cursor_walks_both_sources(self):
+        for i in range(5):
+            self.post(f"Post {i}", limit=10 if i % 2 else 0)
+        self.client.force_authenticate(self.reader)
+        titles, url = [], '/api/feed/?page_size=2'
+        while url:
+            data = self.client.get(url).data
+            titles += [post['title'] for post in data['results']]
+            url = data['next']
+        self.assertEqual(titles, [f"Post {i}" for i in reversed(range(5))])
+
+    def test_entries_are_read_by_keyset_not_post_order(self):
+        self.post("Fanned", limit=10)
+        with CaptureQueriesContext(connection) as queries:
+            timeline.feed_keys(self.reader, None, 20)
+        entries, skipped = [q['sql'] for q in queries]
+        # The precomputed side never touches posts_post, the merge side is bounded
+        self.assertNotIn('posts_post', entries)
+        self.assertIn('LIMIT 20', entries)
+        self.assertIn('LIMIT 20', skipped)
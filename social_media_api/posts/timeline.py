@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from .models import Post, TimelineEntry
+
+User = get_user_model()
+Follow = User.followers.through
+
+# Authors with more followers than this are not fanned out on write; their
+# posts are marked fan_out_skipped and merged into each reader's feed at read
+# time instead. The feed keys on the post, not the author's current count, so
+# an author crossing the limit either way loses nothing.
+FANOUT_FOLLOWER_LIMIT = getattr(settings, 'TIMELINE_FANOUT_FOLLOWER_LIMIT', 10000)
+# How many recent posts to copy into a timeline when a new follow happens
+BACKFILL_LIMIT = getattr(settings, 'TIMELINE_BACKFILL_LIMIT', 200)
+BATCH_SIZE = 1000
+
+
+def follower_ids(author_id):
+    # `a.followers.add(b)` means b follows a, so followers sit on the "to" side
+    return Follow.objects.filter(from_customuser_id=author_id).values_list('to_customuser_id', flat=True)
+
+
+def is_celebrity(author_id):
+    return User.objects.filter(pk=author_id, followers_count__gt=FANOUT_FOLLOWER_LIMIT).exists()
+
+
+def fan_out_post(post):
+    # Push a freshly created post onto every follower's timeline
+    if is_celebrity(post.author_id):
+        Post.objects.filter(pk=post.pk).update(fan_out_skipped=True)
+        post.fan_out_skipped = True
+        return 0
+    entries = [
+        TimelineEntry(user_id=uid, post_id=post.pk, created_at=post.created_at)
+        for uid in follower_ids(post.author_id).iterator()
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(entries)
+
+
+def remove_post(post):
+    # Rows also go away through the FK cascade; this covers soft removals
+    TimelineEntry.objects.filter(post=post).delete()
+
+
+def backfill(user_id, author_ids):
+    # New follows copy the authors' recent posts into the follower's timeline
+    # (one query for any number of authors; skipped posts are read at feed time)
+    posts = (
+        Post.objects.filter(author_id__in=author_ids, fan_out_skipped=False)
+        .order_by('-created_at', '-id').values_list('id', 'created_at')
+    )
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=pk, created_at=created_at)
+        for pk, created_at in posts[:BACKFILL_LIMIT]
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(entries)
+
+
+def prune(user_id, author_ids=None):
+    # Drop an unfollowed author's posts (or everything when author_ids is None)
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    if author_ids is not None:
+        entries = entries.filter(post__author_id__in=author_ids)
+    entries.delete()
+
+
+def newest_first(queryset, position, pk_field, limit):
+    # (created_at, pk) pairs after the keyset position, newest first
+    if position is not None:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, **{f'{pk_field}__lt': pk})
+        )
+    return list(queryset.order_by('-created_at', f'-{pk_field}').values_list('created_at', pk_field)[:limit])
+
+
+def feed_keys(user, position, limit):
+    # One page of the feed as (created_at, post id) pairs: the precomputed
+    # entries (a range scan of timeline_user_recent_idx) merged with followed
+    # authors' posts that skipped the fan-out (post_fan_out_skipped_idx), each
+    # side bounded by the page size so neither query walks posts_post
+    followed = Follow.objects.filter(to_customuser_id=user.pk).values('from_customuser_id')
+    entries = newest_first(TimelineEntry.objects.filter(user=user), position, 'post_id', limit)
+    skipped = newest_first(Post.objects.filter(fan_out_skipped=True, author_id__in=followed), position, 'id', limit)
+    return sorted(set(entries + skipped), reverse=True)[:limit]
@@ -0,0 +1,67 @@
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from .models import Post
+
+# Post.hot_score is ln(sum(weight * e^((t - EPOCH) / TAU))) over a post's
+# like/comment events. Every score shares the factor e^(-(now - EPOCH) / TAU),
+# so ordering by the stored column is ordering by the time-decayed score, and
+# each event is a single UPDATE instead of a rescan of Like/Comment.
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+TAU = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 12) * 3600 / math.log(2)
+POST_WEIGHT = 1.0
+LIKE_WEIGHT = getattr(settings, 'TRENDING_LIKE_WEIGHT', 1.0)
+COMMENT_WEIGHT = getattr(settings, 'TRENDING_COMMENT_WEIGHT', 3.0)
+
+MAX_K = 100
+CACHE_KEY = 'posts:hot:top'
+# How long the compacted top-K list is served before it's rebuilt
+COMPACT_INTERVAL = getattr(settings, 'TRENDING_COMPACT_INTERVAL', 60)
+
+
+def contribution(weight, at=None):
+    at = at or timezone.now()
+    return math.log(weight) + (at - EPOCH).total_seconds() / TAU
+
+
+def add_event(post_ids, weight, at=None):
+    # hot_score = logaddexp(hot_score, c), computed in the database
+    c = Value(contribution(weight, at), output_field=FloatField())
+    score = F('hot_score')
+    Post.objects.filter(pk__in=post_ids).update(
+        hot_score=Greatest(score, c) + Ln(1 + Exp(-Abs(score - c)))
+    )
+
+
+def remove_events(post_id, weight, times):
+    # Subtract events' contributions at their original times (clamped at ~zero);
+    # many events fold into one logsumexp, so still a single UPDATE
+    contributions = [contribution(weight, at) for at in times]
+    if not contributions:
+        return
+    top = max(contributions)
+    c = Value(top + math.log(sum(math.exp(x - top) for x in contributions)), output_field=FloatField())
+    score = F('hot_score')
+    Post.objects.filter(pk=post_id).update(
+        hot_score=score + Ln(Greatest(1 - Exp(c - score), Value(1e-9, output_field=FloatField())))
+    )
+
+
+def compact():
+    # Rebuild the cached top-K from the hot_score index
+    ids = list(Post.objects.order_by('-hot_score', '-id').values_list('id', flat=True)[:MAX_K])
+    cache.set(CACHE_KEY, ids, COMPACT_INTERVAL)
+    return ids
+
+
+def top(k):
+    ids = cache.get(CACHE_KEY)
+    if ids is None:
+        ids = compact()
+    return ids[:k]
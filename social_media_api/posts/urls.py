@@ -1,6 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, CommentViewSet, FeedView, LikePostView, UnlikePostView
+from .views import (
+    PostViewSet, CommentViewSet, FeedView, LikePostView, UnlikePostView, BulkLikeView, BulkUnlikeView,
+    PostCommentsView, PostThreadView,
+)
 
 router = DefaultRouter()
 router.register(r'posts', PostViewSet)
@@ -9,8 +12,12 @@ router.register(r'comments', CommentViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('feed/', FeedView.as_view(), name='feed'),
+    path('posts/<int:pk>/comments/', PostCommentsView.as_view(), name='post-comments'),
+    path('posts/<int:pk>/thread/', PostThreadView.as_view(), name='post-thread'),
     
     # ✅ Like/Unlike routes
     path('posts/<int:pk>/like/', LikePostView.as_view(), name='like-post'),
     path('posts/<int:pk>/unlike/', UnlikePostView.as_view(), name='unlike-post'),
+    path('posts/bulk/like/', BulkLikeView.as_view(), name='bulk-like'),
+    path('posts/bulk/unlike/', BulkUnlikeView.as_view(), name='bulk-unlike'),
 ]
@@ -1,19 +1,56 @@
 from rest_framework import generics, permissions, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
 from .models import Post, Comment, Like
-from .serializers import PostSerializer, CommentSerializer
-from notifications.models import Notification
+from .serializers import PostSerializer, CommentSerializer, BulkPostIdsSerializer
+from notifications.pipeline import notify
+from . import timeline, trending
+from .pagination import KeysetCursorPagination, ThreadPagination
+from .likes import bulk_like, bulk_unlike, like_buffer, buffering_enabled
+
+
+def comments_limit(request):
+    # ?comments_limit=N caps nested comments to the latest N per post
+    try:
+        return max(0, int(request.query_params['comments_limit']))
+    except (KeyError, ValueError):
+        return None
+
+
+def post_queryset(queryset, request):
+    # Eager-load what PostSerializer renders, then prune it down to ?fields/?expand
+    queryset = PostSerializer.setup_eager_loading(queryset, comments_limit(request))
+    return PostSerializer.prune_queryset(queryset, request, keep=['created_at'])
+
 
 # 👇 Posts CRUD
 class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all().order_by('-created_at')
+    queryset = Post.objects.all().order_by('-created_at', '-id')
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetCursorPagination
+
+    def get_queryset(self):
+        return post_queryset(super().get_queryset(), self.request)
+
+    # ✅ posts/hot/: top-K by time-decayed likes/comments, served from the cached list
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def hot(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), trending.MAX_K))
+        except ValueError:
+            limit = 20
+        ids = trending.top(limit)
+        posts = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer([posts[pk] for pk in ids if pk in posts], many=True)
+        return Response(serializer.data)
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        # ✅ Fan-out-on-write into followers' timelines
+        timeline.fan_out_post(post)
 
     def perform_update(self, serializer):
         if serializer.instance.author != self.request.user:
@@ -23,31 +60,84 @@ class PostViewSet(viewsets.ModelViewSet):
     def perform_destroy(self, instance):
         if instance.author != self.request.user:
             raise PermissionError("You can only delete your own posts.")
+        timeline.remove_post(instance)
         instance.delete()
 
 
 # 👇 Comments CRUD
 class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all().order_by('-created_at')
+    queryset = Comment.objects.select_related('author').order_by('-created_at', '-id')
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetCursorPagination
+
+    def get_queryset(self):
+        return CommentSerializer.prune_queryset(super().get_queryset(), self.request, keep=['created_at'])
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
 
+# 👇 A post's comments, newest first (?count_only returns just the total)
+class PostCommentsView(generics.ListAPIView):
+    serializer_class = CommentSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetCursorPagination
+
+    def get_queryset(self):
+        comments = Comment.objects.filter(post_id=self.kwargs['pk']).select_related('author')
+        return CommentSerializer.prune_queryset(comments, self.request, keep=['created_at'])
+
+    def list(self, request, *args, **kwargs):
+        post = generics.get_object_or_404(Post.objects.only('pk', 'comments_count'), pk=kwargs['pk'])
+        if 'count_only' in request.query_params:
+            return Response({'count': post.comments_count})
+        return super().list(request, *args, **kwargs)
+
+
+# 👇 A post's comment threads, paginated by top-level comment
+def nest_replies(comments, rows):
+    # Rows arrive in path order, so every parent precedes its replies.
+    # Keys come from the model, so ?fields may leave out id/parent.
+    by_id, roots = {}, []
+    for comment, row in zip(comments, rows):
+        row['replies'] = []
+        by_id[comment.pk] = row
+        parent = by_id.get(comment.parent_id)
+        (parent['replies'] if parent is not None else roots).append(row)
+    return roots
+
+
+class PostThreadView(generics.ListAPIView):
+    serializer_class = CommentSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = ThreadPagination
+
+    def get_queryset(self):
+        post = generics.get_object_or_404(Post.objects.only('pk'), pk=self.kwargs['pk'])
+        return Comment.objects.filter(post=post).select_related('author')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(nest_replies(page, serializer.data))
+
+
 # 👇 Feed view
 class FeedView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        # ✅ Users the current user follows
-        following_users = user.following.all()
-        # ✅ Posts from followed users ordered by newest first
-        posts = Post.objects.filter(author__in=following_users).order_by('-created_at')
-        serializer = PostSerializer(posts, many=True, context={'request': request})
-        return Response(serializer.data)
+        # ✅ Served from the precomputed timeline (celebrity posts merged on read)
+        # ✅ Keyset pagination: ?cursor=<next token>; the page's posts are then loaded by id
+        paginator = KeysetCursorPagination()
+        page = paginator.paginate_keys(
+            lambda position, limit: timeline.feed_keys(request.user, position, limit),
+            lambda pks: post_queryset(Post.objects.filter(pk__in=pks), request),
+            request,
+        )
+        serializer = PostSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
 
 # 👇 Like a post
@@ -58,18 +148,18 @@ class LikePostView(APIView):
         # ✅ Use DRF generics.get_object_or_404
         post = generics.get_object_or_404(Post, pk=pk)
 
+        # ✅ Buffered mode: coalesce into the next flush
+        if buffering_enabled():
+            like_buffer.add(request.user.pk, post.pk, liked=True)
+            return Response({"message": "Like queued."}, status=status.HTTP_202_ACCEPTED)
+
         # ✅ Like.objects.get_or_create ensures one like per user
         like, created = Like.objects.get_or_create(user=request.user, post=post)
 
         if created:
-            # ✅ Notification.objects.create
+            # ✅ Queued for the background notification workers
             if post.author != request.user:
-                Notification.objects.create(
-                    recipient=post.author,
-                    actor=request.user,
-                    verb="liked your post",
-                    target=post
-                )
+                notify(post.author, request.user, "liked your post", target=post)
             return Response({"message": "Post liked."}, status=status.HTTP_201_CREATED)
         else:
             return Response({"message": "You already liked this post."}, status=status.HTTP_200_OK)
@@ -81,9 +171,35 @@ class UnlikePostView(APIView):
 
     def post(self, request, pk):
         post = generics.get_object_or_404(Post, pk=pk)
+        if buffering_enabled():
+            like_buffer.add(request.user.pk, post.pk, liked=False)
+            return Response({"message": "Unlike queued."}, status=status.HTTP_202_ACCEPTED)
         try:
             like = Like.objects.get(user=request.user, post=post)
             like.delete()
             return Response({"message": "Post unliked."}, status=status.HTTP_200_OK)
         except Like.DoesNotExist:
             return Response({"error": "You have not liked this post."}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# 👇 Like / unlike many posts in one call
+class BulkLikeView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    liked = True
+
+    def post(self, request):
+        serializer = BulkPostIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        pairs = {(request.user.pk, post_id) for post_id in serializer.validated_data['post_ids']}
+
+        if buffering_enabled():
+            for user_id, post_id in pairs:
+                like_buffer.add(user_id, post_id, liked=self.liked)
+            return Response({"queued": sorted(p for _, p in pairs)}, status=status.HTTP_202_ACCEPTED)
+
+        changed = bulk_like(pairs) if self.liked else bulk_unlike(pairs)
+        return Response({"changed": sorted(p for _, p in changed)}, status=status.HTTP_200_OK)
+
+
+class BulkUnlikeView(BulkLikeView):
+    liked = False
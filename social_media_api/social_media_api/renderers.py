@@ -0,0 +1,73 @@
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pure-Python fallback
+    orjson = None
+
+_encoder = encoders.JSONEncoder()
+
+
+def stock_dumps(data):
+    # json with DRF's encoder and JSONRenderer's compact, strict options
+    return json.dumps(
+        data, cls=encoders.JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(',', ':'),
+    ).encode('utf-8')
+
+
+def dumps(data):
+    # Compact UTF-8 JSON. Datetimes, Decimals, lazy strings etc. go through
+    # DRF's own encoder. orjson still differs from JSONRenderer on floats: it
+    # writes the shortest form (1e16, not 1e+16; 1.5e-7, not 1.5e-07) and
+    # NaN/Infinity as null where strict JSONRenderer raises.
+    if orjson is not None:
+        try:
+            out = orjson.dumps(
+                data, default=_encoder.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            # Whatever orjson refuses (ints wider than 64 bits, ...) gets the stock path
+            out = stock_dumps(data)
+    else:
+        out = stock_dumps(data)
+    # Like JSONRenderer, escape U+2028/U+2029 so the output is also valid JavaScript
+    return out.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONRenderer(JSONRenderer):
+    # Drop-in JSONRenderer backed by orjson (falls back to json when missing).
+    # Feeds and lists are keyset-paginated, so responses are never long
+    # enough to be worth streaming.
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            # Pretty-printing is for humans; leave it to the stock renderer
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            raw = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                raw = raw.decode(encoding).encode('utf-8')
+            return orjson.loads(raw)
+        except (ValueError, UnicodeError) as exc:
+            # orjson.JSONDecodeError subclasses ValueError
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -54,6 +54,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'social_media_api.wsgi.application'
+ASGI_APPLICATION = 'social_media_api.asgi.application'  # needed for notification streaming
 
 # Database
 DATABASES = {
@@ -67,6 +68,15 @@ DATABASES = {
     }
 }
 
+# Shared cache: token auth, unread counts, trending and suggestions must agree
+# across every worker process (Django's built-in Redis backend, needs `redis`)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/1'),
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -95,14 +105,69 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 # REST framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # orjson for response and request bodies (stock json when it isn't installed)
+    'DEFAULT_RENDERER_CLASSES': [
+        'social_media_api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'social_media_api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Token auth cache: in-process LRU in front of the shared (Redis) cache
+AUTH_TOKEN_LOCAL_CACHE_SIZE = 10000
+AUTH_TOKEN_LOCAL_CACHE_TTL = 30  # seconds
+AUTH_TOKEN_CACHE_TTL = 300  # seconds
+
+# Password hashing pool: concurrent hashes and how many may queue before 429
+PASSWORD_HASH_WORKERS = 4
+PASSWORD_HASH_MAX_PENDING = 32
+
+# "Who to follow" suggestions from the in-memory follow graph
+FOLLOW_SUGGESTIONS_TOP_K = 20
+FOLLOW_SUGGESTIONS_CACHE_TTL = 600  # seconds
+FOLLOW_GRAPH_RELOAD_INTERVAL = 300  # seconds
+
+# Feed timelines: authors above this follower count are merged at read time
+TIMELINE_FANOUT_FOLLOWER_LIMIT = 10000
+TIMELINE_BACKFILL_LIMIT = 200
+
+# Like buffering: coalesce like/unlike writes and flush them in bulk
+LIKE_BUFFER_ENABLED = False
+LIKE_BUFFER_FLUSH_INTERVAL = 1.0  # seconds
+LIKE_BUFFER_MAX_PENDING = 5000
+
+# Notifications are recorded in an outbox table with the request and written by
+# background workers; rows the queue loses (overflow, crashes) are replayed by a drain
+NOTIFICATIONS_ASYNC = True
+NOTIFICATION_BROKER = 'notifications.pipeline.LocalBroker'
+NOTIFICATION_QUEUE_SIZE = 10000
+NOTIFICATION_WORKERS = 2
+NOTIFICATION_BATCH_SIZE = 500
+NOTIFICATION_OUTBOX_DRAIN_INTERVAL = 30  # seconds between outbox replays
+NOTIFICATION_AGGREGATION = True
+NOTIFICATION_AGGREGATION_WINDOW = 3600  # seconds
+NOTIFICATION_SAMPLE_ACTORS = 5
+NOTIFICATION_UNREAD_CACHE_TTL = 300  # seconds before the cached unread count is recomputed
+NOTIFICATION_PUBSUB = 'notifications.pubsub.LocalPubSub'
+NOTIFICATION_STREAM_HEARTBEAT = 15  # seconds between SSE keep-alive comments
+NOTIFICATION_LONG_POLL_TIMEOUT = 25  # seconds
+
+# Trending ("hot") posts: exponential decay of like/comment weight
+TRENDING_HALF_LIFE_HOURS = 12
+TRENDING_LIKE_WEIGHT = 1.0
+TRENDING_COMMENT_WEIGHT = 3.0
+TRENDING_COMPACT_INTERVAL = 60  # seconds the cached top-K list is reused
+
 # Production security settings
 SECURE_BROWSER_XSS_FILTER = True
 X_FRAME_OPTIONS = 'DENY'
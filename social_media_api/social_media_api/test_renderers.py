@@ -0,0 +1,23 @@
+import json
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .renderers import FastJSONRenderer
+
+
+class FastJSONRendererTestCase(SimpleTestCase):
+    def test_matches_stock_renderer(self):
+        data = {'when': timezone.now(), 'price': Decimal('9.99'), 'text': 'café  ', 'items': list(range(450))}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_values_orjson_refuses_use_the_stock_encoder(self):
+        data = {'big': 2 ** 70, 'ok': 1}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_float_differences_are_still_valid_json(self):
+        # Shortest float forms differ from JSONRenderer but parse to the same values
+        data = [1e16, 1.5e-07, 0.1]
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), data)